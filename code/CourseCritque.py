@@ -1,356 +1,344 @@
 # coding=utf8
 import pandas as pd
-import numpy as np
-import scipy
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 import json
+import argparse
+from permutationTest import permutationTest
+from scrapeCache import CacheMiss, SnapshotCache, cachedScrape
+from pipeline import Pipeline
+from surveyStore import MultiSelect, loadSurvey
+from figures import renderFigures
+from regression import regressionMatrix
+from catalog import CourseCatalog, buildCatalog, courseKey, readCourseList
+from cube import RetentionCube, accumulateCube, storeTerm, storedTerms
+from ingest import GRADE_COLUMNS
+import instrument
 import os
-import seaborn as sns
-import matplotlib.pyplot as plt
-from matplotlib.gridspec import GridSpec
-import matplotlib
-matplotlib.use('QT5Agg')
-plt.plot()
-plt.close()
+import sys
 
-if __name__ == '__main__':
+# selenium, scipy and matplotlib are imported inside the functions that use them so
+# commands that do not scrape or plot start without loading them
+
+COURSES_URL = 'https://omscentral.com/courses'
+
+
+def scrapeCourseTable(url, driverPath):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
 
-    # IMPORTANT TO CHECK YOUR Browser Version to make sure it matches the chromedriver
-    # This chromedriver version is for 95.0.4638.69
-    root = os.getcwd()
-    DRIVER_PATH = root + '/chromedriver'
-    driver = webdriver.Chrome(executable_path=DRIVER_PATH)
     options = Options()
     options.headless = True
     options.add_argument("--window-size=1920,1200")
+    with instrument.stage('chrome startup'):
+        driver = webdriver.Chrome(options=options, executable_path=driverPath)
+    try:
+        with instrument.stage('page load'):
+            driver.get(url)
+            elements = driver.find_elements_by_class_name('MuiTableRow-root')
+            return driver.page_source, [e.text for e in elements]
+    finally:
+        driver.quit()
+
+
+def parseCourseTable(rows):
+    # Each course row reads "<ID> <name>\n<difficulty>\n<workload>\n<rating>..."
+    courseList = []
+    for e_text in rows:
+        try:
+            id = e_text.split(' ')[0]
+            courseKey(id)
+            diff = float(e_text.split('\n')[1])
+            workload = float(e_text.split('\n')[2])
+            sat = float(e_text.split('\n')[3])
+        except (IndexError, ValueError):
+            continue
+        courseDict = dict(zip(['Class', 'Difficulty', 'Workload', 'Satisfaction'],
+                              [id, diff, workload, sat]))
+        courseList.append(courseDict)
+    # Rows whose id is not a course id are skipped like unparseable scores.
+    # Class keeps the omscentral form (CS-7641); the catalog reconciles it with Course Critique
+    return pd.DataFrame(courseList, columns=['Class', 'Difficulty', 'Workload', 'Satisfaction'])
+
+
+def aggregateRetention(cube):
+    # Mean withdrawal rate of the Very Large sections, one row per course id and modality
+    means = cube.query(by=['CourseId', 'isOnline'], where={'Size': lambda s: s.str.contains('Very Large')},
+                       values=['W%'])
+    return means.drop(columns='sections').rename(columns={'W%': 'Retention'})
+
+
+def mergeCourses(retention, courseData, catalog):
+    online = retention[retention.isOnline == 1][['CourseId', 'Retention']].rename(columns={'Retention': 'Retention_Online'})
+    trad = retention[retention.isOnline == 0][['CourseId', 'Retention']].rename(columns={'Retention': 'Retention_Trad'})
+    merged = online.merge(trad, how='inner', on='CourseId')
+    # Courses missing from the catalog are numbered in memory by encode; they have no retention rows anyway
+    scores = courseData.assign(CourseId=catalog.encode(courseData['Class'])).drop(columns='Class')
+    # One score row per course, even if the table lists a course twice
+    scores = scores.groupby('CourseId', as_index=False, sort=False).mean()
+    merged = merged.merge(scores, how='left', on='CourseId')
+    merged.insert(1, 'Class', catalog.decode(merged['CourseId']))
+    return merged
+
+
+# Survey question ids
+EXPERIENCE = '1626105223092'
+PROGRAM = '1626105037244'
+SUBJECT = '1626105078795'
+WORKING = '1626104998715'
+LIKERT = ['1626105482960', '1626105592894', '1626105621816', '1626105652893']
+ENGAGEMENT = '1626105793308'
+SATISFACTION = '1626105894334'
+DROPPED = '1626105969443'
+ENJOYED_DROPPED = '1626105994076'
+DROP_REASONS = '1626106015516'
+
+ENGAGEMENT_OPTIONS = ['Weekly quizzes',
+                      'Weekly status checks with instructors/TAs',
+                      'Discussion boards to ask questions for instructors and other students',
+                      'Detailed feedback from instructors/TAs on assignments',
+                      'Other']
+SATISFACTION_OPTIONS = ['Course’s material had real world value',
+                        'Course was challenging',
+                        'Good communication with TAs/instructors',
+                        'Enjoyed the course structure (ie. projects, tests, number of HW assignments)',
+                        'Other']
+DROP_REASON_OPTIONS = ['Did not have enough time',
+                       'Low cost penalty for dropping',
+                       'Did not enjoy the material',
+                       'There was little engagement or feedback from instructors or TA',
+                       'Personal issue came up',
+                       'Did not enjoy the structure of the class',
+                       'Was not prepared/not doing well',
+                       'Other']
+
+
+def _isComputerScience(s):
+    return 'Computer ' in s or s == 'Comp Sci' or s == 'HCI' or s == 'Cybersecurity' or 'Educational Technology' in s
+
+
+def tabulateSurvey(survey):
+    # Share of respondents giving each answer, for every survey figure
+    marginals, blanks = survey.marginals()
+    n = survey.nRespondents
+    tables = {}
+
+    # Blank years of experience and working hours count as 0
+    counts = marginals[EXPERIENCE].rename(lambda x: x.replace(' years', ''))
+    counts = pd.concat([pd.Series([blanks[EXPERIENCE]], index=['0']), counts])
+    counts = counts.groupby(level=0).sum()
+    counts = counts.reindex(sorted(counts.index, key=lambda x: int(x.split(' ')[0].rstrip('+'))))
+    tables['experience'] = [list(counts.index), list(counts / n)]
+
+    counts = marginals[PROGRAM].sort_index()
+    tables['program'] = [list(counts.index), list(counts / counts.sum())]
+
+    counts = marginals[SUBJECT]
+    counts = pd.Series(counts.values, index=['Computer Science' if _isComputerScience(x) else 'Other' for x in counts.index])
+    counts = pd.concat([counts, pd.Series([blanks[SUBJECT]], index=['Other'])]).groupby(level=0).sum()
+    tables['subject'] = [list(counts.index), list(counts / n)]
+
+    counts = marginals[WORKING]
+    counts = pd.concat([pd.Series([blanks[WORKING]], index=['0']), counts]).groupby(level=0).sum().sort_index()
+    tables['working'] = [list(counts.index), list(counts / n)]
+
+    # 1-5 levels of agreement
+    for qid in LIKERT:
+        counts = marginals[qid].reindex([str(x) for x in range(1, 6)], fill_value=0)
+        tables[qid] = list(counts / counts.sum())
+
+    tables['engagement'] = list(MultiSelect.fromSurvey(survey, ENGAGEMENT, ENGAGEMENT_OPTIONS).frequencies() / n)
+    tables['satisfaction'] = list(MultiSelect.fromSurvey(survey, SATISFACTION, SATISFACTION_OPTIONS).frequencies() / n)
+
+    tables['dropPercent'] = marginals[DROPPED].get('Yes', 0) / n
+    tables['enjoyPercent'] = marginals[ENJOYED_DROPPED].get('Yes', 0) / marginals[ENJOYED_DROPPED].sum()
+
+    dropReasons = MultiSelect.fromSurvey(survey, DROP_REASONS, DROP_REASON_OPTIONS)
+    tables['dropReasons'] = (dropReasons.frequencies() / dropReasons.answered.sum()).to_dict()
+    # Respondents giving each drop reason, split by hours worked and by program
+    tables['dropReasonsByHours'] = dropReasons.crosstab(survey, WORKING).to_dict(orient='index')
+    tables['dropReasonsByProgram'] = dropReasons.crosstab(survey, PROGRAM).to_dict(orient='index')
+    return tables
+
+
+def buildPipeline(dataDir, visualDir, artifactDir, cache, driverPath, replay=False, refresh=False, nIter=1000000,
+                  nBoot=10000, surveyPath=None, forceRender=False):
+    pipeline = Pipeline(artifactDir, params={'nIter': nIter, 'nBoot': nBoot})
+    # Exports of terms released after CourseCritque.csv, added with "retention --add-term"
+    termsDir = dataDir + '/terms'
+    os.makedirs(termsDir, exist_ok=True)
 
     # Get CSV file of the course critique classes
     # This file was manually collected for CS and ISYE courses that have both a traditional and online class
     # Course critique cannot be scraped using selenium since it is not housed as HTML
-    courseCritique = pd.read_csv(os.path.normpath(root + os.sep + os.pardir)+'/data/CourseCritque.csv', encoding="utf-8")
+    # The file is streamed in chunks into running grade sums and counts per class, term,
+    # teacher, modality and size
+    @pipeline.stage('ingest', files=[dataDir + '/CourseCritque.csv'])
+    def ingest():
+        return accumulateCube(dataDir + '/CourseCritque.csv').toFrame()
 
     # Get overall course scores from OMS Reviews
-    driver = webdriver.Chrome(options=options, executable_path=DRIVER_PATH)
-    driver.get('https://omscentral.com/courses')
-    elements = driver.find_elements_by_class_name('MuiTableRow-root')
-
-    #Get list of courses to scrap then create a dataframe from results
-    courses = list(np.unique(courseCritique.Class))
-    courses = [x.replace(' ', '-') for x in courses]
-    courseList = []
-    for e in elements:
-        e_text = e.text
-        if e_text.split(' ')[0] in courses:
-            id = e_text.split(' ')[0]
-            diff = float(e_text.split('\n')[1])
-            workload = float(e_text.split('\n')[2])
-            sat = float(e_text.split('\n')[3])
-            courseDict = dict(zip(['Class', 'Difficulty', 'Workload', 'Satisfaction'],
-                                  [id, diff, workload, sat]))
-            courseList.append(courseDict)
-    courseData = pd.DataFrame(courseList)
-    driver.quit()
-    courseData['Class'] = [x.replace('-', ' ') for x in courseData['Class']]
-
-    courseCritique = courseCritique[courseCritique['Size'].str.contains('Very Large')]
-    courseCritique['isOnline'] = np.where(courseCritique.Section.isin(['O03', 'O01']), 1, 0)
-
-    online = courseCritique[courseCritique.isOnline == 1].groupby(['Class'])['W%'].mean().reset_index().rename(columns = {'W%':'Retention_Online'})
-    trad = courseCritique[courseCritique.isOnline == 0].groupby(['Class'])['W%'].mean().reset_index().rename(columns = {'W%':'Retention_Trad'})
-
-    all = online.merge(trad, how = 'inner', on = 'Class')
-    all = all.merge(courseData, how='left', on='Class')
-
-    # Create density plots of traditional and online courses
-    ax = sns.distplot(all.Retention_Online, label = 'Online')
-    ax = sns.distplot(all.Retention_Trad, label = 'Trad')
-    plt.xlabel('1-Retention Rate (%)')
-    plt.ylabel('Density')
-    plt.title('Online vs. Traditional Retention Rates')
-    plt.legend(loc = 'best')
-    plt.savefig('RetentionDist.png')
-
-    # Create plots comparing traditional and online retention rates
-    # Create plots of online traditional rates vs. workload and difficulty of courses
-    fig = plt.figure(figsize=(13.5, 5.5))
-    ax1 = fig.add_subplot(131)
-    ax1.set_title('Trad vs. Online Retention', size=12)
-    ax2 = fig.add_subplot(132)
-    ax2.set_title('Online Retention vs. Workload', size=12)
-    ax3 = fig.add_subplot(133)
-    ax3.set_title('Online Retention vs. Difficulty', size=12)
-    ax1.plot(all['Retention_Trad'], all['Retention_Online'], marker="o", linestyle="", alpha=0.8, markersize=5, color='black',
-               markeredgecolor='none')
-    m, b, r_value, p_value, std_err = scipy.stats.linregress(all['Retention_Trad'], all['Retention_Online'])
-    ax1.plot(all['Retention_Trad'], m * all['Retention_Trad'] + b)
-    ax1.text(5, 35, 'rsq = {}'.format(round(r_value, 3)), fontsize=11)
-    ax1.text(5, 33.5, 'p-val = {}'.format(round(p_value, 2)), fontsize=11)
-    ax1.set_xlabel('1-Traditional Retention Rate(%)')
-    ax1.set_ylabel('1-Online Retention Rate(%)')
-
-    ax2.plot(all['Retention_Online'], all['Workload'], marker="o", linestyle="", alpha=0.8, markersize=5, color='black',
-             markeredgecolor='none')
-    m, b, r_value, p_value, std_err = scipy.stats.linregress(all['Retention_Online'], all['Workload'])
-    ax2.plot(all['Retention_Online'], m * all['Retention_Online'] + b)
-    ax2.text(15, 27, 'rsq = {}'.format(round(r_value, 3)), fontsize=11)
-    ax2.text(15, 26, 'p-val = {}'.format(round(p_value, 3)), fontsize=11)
-    ax2.set_xlabel('1-Online Retention Rate(%)')
-    ax2.set_ylabel('Workload (hrs/wk)')
-
-    ax3.plot(all['Retention_Online'], all['Difficulty'], marker="o", linestyle="", alpha=0.8, markersize=5,
-             color='black', markeredgecolor='none')
-    m, b, r_value, p_value, std_err = scipy.stats.linregress(all['Retention_Online'], all['Difficulty'])
-    ax3.plot(all['Retention_Online'], m * all['Retention_Online'] + b)
-    ax3.text(30, 2.75, 'rsq = {}'.format(round(r_value, 3)), fontsize=11)
-    ax3.text(30, 2.65, 'p-val = {}'.format(round(p_value, 3)), fontsize=11)
-    ax3.set_xlabel('1-Online Retention Rate(%)')
-    ax3.set_ylabel('Difficulty (1-5)')
-    plt.tight_layout()
-    plt.savefig('LinearRegPlots.png')
-
-    # Get the top 5 classes in terms of retention rates
-    # Create bar plot
-    top5 = all.sort_values('Retention_Online', ascending=False).head()
-    rt_Online = list(top5['Retention_Online'])
-    rt_Trad = list(top5['Retention_Trad'])
-    br1 = np.arange(len(rt_Online))
-    barWidth = 0.25
-    br2 = [x + barWidth for x in br1]
-    br3 = [x + barWidth for x in br2]
-
-    fig = plt.figure()
-    plt.bar(br1, rt_Online, color='b', width=barWidth,
-            edgecolor='grey', label='Online', alpha = 0.6)
-    plt.bar(br2, rt_Trad, color='g', width=barWidth,
-            edgecolor='grey', label='Traditional', alpha = 0.6)
-    plt.xlabel('Courses')
-    plt.ylabel('1-Retention Rate(%)')
-    plt.title('Top 5 Lowest Online Retention Rates')
-    plt.xticks([r + barWidth for r in range(len(rt_Online))],
-               list(top5['Class']))
-    plt.legend(loc = 'best')
-    plt.savefig('HighDropRateBarPlot.png')
+    # Always runs, but only starts a browser when refreshing or the page is not in the scrape cache
+    @pipeline.stage('scrape', always=True)
+    def scrape():
+        rows = cachedScrape(cache, COURSES_URL, lambda url: scrapeCourseTable(url, driverPath), replay=replay,
+                            refresh=refresh)
+        return parseCourseTable(rows)
+
+    # Number every course in courses.csv and Course Critique once; the ids are kept in
+    # catalog.json so they stay the same as courses are added. Courses only in the omscentral
+    # table are numbered when merged, so the cube and retention queries never need a scrape.
+    # Always runs so new courses are saved to catalog.json even when a cached catalog would do
+    catalogPath = dataDir + '/catalog.json'
+
+    @pipeline.stage('catalog', deps=['ingest'], always=True)
+    def catalog(cells):
+        return buildCatalog(catalogPath, readCourseList(dataDir + '/courses.csv'), cells['Class'],
+                            *[term['Class'] for term in storedTerms(termsDir)])
+
+    # The sums and counts keyed by course id; retention slices are rolled up from its cells.
+    # Added terms are merged in from their stored sums, so CourseCritque.csv is not reread
+    @pipeline.stage('cube', deps=['ingest', 'catalog'], files=[termsDir])
+    def cube(cells, courses):
+        catalog = CourseCatalog.fromFrame(courses)
+        combined = RetentionCube.fromAccumulator(cells, catalog)
+        for term in storedTerms(termsDir):
+            combined.update(RetentionCube.fromAccumulator(term, catalog))
+        return combined.toFrame()
+
+    @pipeline.stage('aggregate', deps=['cube'])
+    def aggregate(cells):
+        return aggregateRetention(RetentionCube.fromFrame(cells))
+
+    @pipeline.stage('merge', deps=['aggregate', 'scrape', 'catalog'])
+    def merge(retention, courseData, courses):
+        return mergeCourses(retention, courseData, CourseCatalog.fromFrame(courses))
+
+    # Every metric against every other, with bootstrap confidence intervals
+    @pipeline.stage('regressions', deps=['merge'])
+    def regressions(merged):
+        return regressionMatrix(merged, nBoot=nBoot, seed=0)
 
     # Run p-test to determine significance of difference in retention rate
-    online['isOnline'] = 1
-    trad['isOnline'] = 0
-    both = pd.concat([online.rename(columns = {'Retention_Online':'Retention'}),
-                      trad.rename(columns = {'Retention_Trad':'Retention'})])
-
-    trueDiff = np.array(both.groupby(['isOnline'])['Retention'].mean())[0] - \
-               np.array(both.groupby(['isOnline'])['Retention'].mean())[1]
-    diffList = []
-    n_iter = 10000
-    for i in range(n_iter):
-        all_copy = both.copy()
-        y_rand = np.array(all_copy['isOnline'])
-        np.random.shuffle(y_rand)
-        all_copy['isOnline'] = y_rand
-        diff = np.array(all_copy.groupby(['isOnline'])['Retention'].mean())[0] - \
-                        np.array(all_copy.groupby(['isOnline'])['Retention'].mean())[1]
-        diffList.append(diff)
-    print(len(np.where(-1*trueDiff < diffList)[0])/len(diffList))
+    # Tests whether online courses have a higher drop rate than traditional courses
+    @pipeline.stage('permutation', deps=['aggregate'])
+    def permutation(retention):
+        result = permutationTest(retention[retention.isOnline == 1]['Retention'],
+                                 retention[retention.isOnline == 0]['Retention'],
+                                 nIter=nIter, alternative='greater', seed=0)
+        return result._asdict()
 
     # Analyze Survey Data
     # Copy and Paste Survey Data from Site to Python then write the file locally for analysis
     # surveyData = [{"id":"1626104557558","text":"Select your age:","answers":["50 - 64","30 - 39","40 - 49","18 - 29","18 - 29","18 - 29","30 - 39","30 - 39","18 - 29","18 - 29","40 - 49","30 - 39","18 - 29","18 - 29","18 - 29","30 - 39","40 - 49","18 - 29","18 - 29","30 - 39","30 - 39","30 - 39","18 - 29","18 - 29","18 - 29","18 - 29","40 - 49","40 - 49","18 - 29","18 - 29","18 - 29","40 - 49","30 - 39","18 - 29","30 - 39","18 - 29","18 - 29","30 - 39"]},{"id":"1626104575444","text":"Are you White, Black or African American, American Indian or Alaskan Native, Asian, Native Hawaiian or other Pacific Islander, or some other race?","answers":["African American","Other","White","White","White","White","Asian","White","White","White","Other","White","Other","White","White","White","Asian","American Indian or Alaskan Native","White","White","Other","Asian","Asian","White","Other","White","Other","Asian","White","White","White","White","White","Asian","Asian","White","Asian","White"]},{"id":"1626104950996","text":"What is your gender?","answers":["Male","Male","Male","Female","Female","Male","Female","Male","Female","Male","Male","Male","Male","Male","Male","Male","Female","Female","Female","Male","Male","Female","Female","Female","Female","Female","Male","Female","Female","Male","Female","Male","Male","Male","Female","Male","Male","Male"]},{"id":"1626104974867","text":"Are you married?","answers":["Yes","Yes","Yes","No","No","No","No","Yes","Yes","No","No","Yes","Yes","No","No","Yes","Yes","No","Yes","Yes","No","Yes","No","No","No","Yes","Yes","Yes","No","Yes","No","Yes","Yes","No","No","No","No","Yes"]},{"id":"1626104998715","text":"If you are employed how many hours do you work per week?","answers":["40-50","40-50","40-50","40-50","20-39","40-50","40-50","40-50","40-50","40-50","40-50","20-39","40-50","1-19","40-50","40-50","40-50","50+","40-50","50+","40-50","50+","","20-39","40-50","50+","40-50","40-50","40-50","40-50","40-50","40-50","","40-50","40-50","40-50","40-50","40-50"]},{"id":"1626105037244","text":"Are you enrolled in an online or traditional/blended graduate level program? ","answers":["Online","Online","Online","Online","Traditional/Blended","Online","Online","Online","Traditional/Blended","Online","Online","Online","Online","Online","Online","Online","Online","Online","Online","Online","Online","Online","Online","Online","Traditional/Blended","Online","Online","Online","Online","Online","Traditional/Blended","Online","Online","Online","Online","Online","Online","Online"]},{"id":"1626105078795","text":"What subject are you currently enrolled in (for example Computer Science)?","answers":["Computer Science / Machine Learning / Interactive Intelligence","Computer Science","Computer Science","Cybersecurity","Mathematics","Computer Science","computer science","HCI","Aerospace engineering ","Computer Science","Computer science ","Computer Science","Computer Science","Comp Sci","Computer Science","Computer Science","Computer Science","Biology","Computer Science ","Computer Science","Computer Science","Educational Technology CS6460","Computer Science","Computer Science - Educational Technology","Digital Media","Computer Science","Computer Science","Computer Science","Computer Science","Computer Science","Civil Engineering ","Data Analytics ","Computer Science","Computer Science ","EdTech","Computer Science","Computer Science","Computer Science"]},{"id":"1626105109801","text":"Before starting the program, had you taken classes on the subject matter before? ","answers":["Yes","Yes","Yes","Yes","Yes","Yes","No","Yes","Yes","Yes","Yes","Yes","Yes","Yes","Yes","Yes","Yes","No","Yes","Yes","Yes","No","No","Yes","Yes","Yes","Yes","No","Yes","Yes","No","Yes","Yes","Yes","Yes","Yes","Yes","Yes"]},{"id":"1626105133179","text":"Before starting the program, had you gained experience in the subject matter from work?","answers":["Yes","Yes","Yes","Yes","No","Yes","No","Yes","Yes","Yes","Yes","Yes","Yes","No","No","Yes","Yes","No","Yes","Yes","Yes","No","No","Yes","Yes","Yes","Yes","Yes","Yes","Yes","Yes","Yes","No","Yes","Yes","Yes","Yes","Yes"]},{"id":"1626105223092","text":"If yes to previous question, how many years of relevant work experience to your subject have you had?","answers":["10+ years","7 to 10 years","10+ years","4 to 7 years","","1 to 3 years","1 to 3 years","4 to 7 years","1 to 3 years","4 to 7 years","10+ years","10+ years","1 to 3 years","","","7 to 10 years","7 to 10 years","1 to 3 years","1 to 3 years","10+ years","1 to 3 years","","","1 to 3 years","1 to 3 years","1 to 3 years","10+ years","10+ years","1 to 3 years","1 to 3 years","1 to 3 years","1 to 3 years","","1 to 3 years","7 to 10 years","1 to 3 years","4 to 7 years","7 to 10 years"]},{"id":"1626105321739","text":"How many courses have you finished in your respective program?","answers":["7-10","4-6","7-10","1-3","4-6","1-3","4-6","7-10","1-3","1-3","1-3","4-6","4-6","1-3","1-3","7-10","7-10","1-3","7-10","7-10","4-6","4-6","1-3","7-10","1-3","1-3","1-3","4-6","1-3","7-10","10+","1-3","4-6","4-6","4-6","1-3","7-10","4-6"]},{"id":"1626105482960","text":"Do you feel there was enough communication or interaction between you and fellow students/instructors?","answers":["4","3","2","4","2","5","3","3","1","3","5","4","3","4","2","3","2","2","3","4","4","5","4","4","4","3","1","2","2","4","2","2","4","4","3","2","2","3"]},{"id":"1626105592894","text":"Did you feel higher satisfaction in courses with higher interaction with students and instructors?","answers":["3","4","4","4","5","5","5","4","4","4","4","5","3","4","4","5","3","4","4","5","4","3","5","5","5","5","5","3","5","3","5","2","4","4","4","5","4","5"]},{"id":"1626105621816","text":"Did you feel engaged and motivated in the courses in your program? ","answers":["5","3","4","4","3","5","3","4","2","4","4","4","4","3","3","4","4","3","4","4","4","5","4","4","4","4","2","4","3","4","4","4","5","4","4","4","3","3"]},{"id":"1626105638101","text":"Were you able to stay focused during lectures and/or help sessions? ","answers":["4","3","4","3","2","3","4","4","2","4","4","3","3","4","2","3","4","3","4","3","3","4","4","4","4","3","3","4","2","3","2","4","4","4","4","3","4","4"]},{"id":"1626105652893","text":"Were there enough support systems in place in your courses if you had questions or needed help with assignments?","answers":["4","4","4","3","4","5","4","4","2","3","4","4","4","4","3","3","4","4","4","3","3","3","2","3","3","4","2","4","2","5","2","3","4","4","4","4","4","4"]},{"id":"1626105793308","text":"Which of the following means of course engagement would you prefer? (Select all that apply)","answers":["Other","Weekly quizzes;Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly quizzes;Weekly status checks with instructors/TAs;Detailed feedback from instructors/TAs on assignments","Weekly quizzes;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments;Other","Weekly quizzes;Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students","Detailed feedback from instructors/TAs on assignments;Other","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments;Other","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Other","Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Detailed feedback from instructors/TAs on assignments","Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly quizzes;Weekly status checks with instructors/TAs;Detailed feedback from instructors/TAs on assignments","Weekly quizzes;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly status checks with instructors/TAs;Detailed feedback from instructors/TAs on assignments","Detailed feedback from instructors/TAs on assignments;Other","Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students","Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly status checks with instructors/TAs","Weekly quizzes;Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments;Other","Weekly status checks with instructors/TAs;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments;Other","Discussion boards to ask questions for instructors and other students","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly quizzes;Weekly status checks with instructors/TAs","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments","Weekly quizzes;Weekly status checks with instructors/TAs;Discussion boards to ask questions for instructors and other students;Detailed feedback from instructors/TAs on assignments"]},{"id":"1626105894334","text":"What was the reason(s) for satisfaction in your program’s courses? (Select all that apply)","answers":["Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments);Other","Course’s material had real world value;Good communication with TAs/instructors","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course was challenging;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Good communication with TAs/instructors","Course’s material had real world value;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments);Other","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors","Course was challenging;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors","Course’s material had real world value","Course was challenging;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Good communication with TAs/instructors","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Other","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course was challenging;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging","Good communication with TAs/instructors","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Good communication with TAs/instructors;Enjoyed the course structure (ie. projects, tests, number of HW assignments)","Course’s material had real world value;Course was challenging;Good communication with TAs/instructors"]},{"id":"1626105969443","text":"Have you ever dropped a class in your program?","answers":["Yes","Yes","Yes","Yes","Yes","Yes","Yes","No","Yes","No","Yes","Yes","Yes","Yes","No","Yes","Yes","No","No","Yes","No","Yes","No","No","No","No","Yes","No","No","No","Yes","Yes","Yes","No","Yes","No","Yes","Yes"]},{"id":"1626105994076","text":"If yes, did you enjoy the class that you dropped?","answers":["Yes","No","Yes","Yes","No","Yes","Yes","No","Yes","","No","No","Yes","No","","No","No","No","","Yes","No","Yes","","","Yes","","No","No","","","No","No","Yes","","Yes","","No","Yes"]},{"id":"1626106015516","text":"If yes, what was the reason(s) for dropping out of a class? (Select all that apply)","answers":["Did not have enough time;Low cost penalty for dropping;Personal issue came up;Did not enjoy the structure of the class;Other","Did not have enough time;Personal issue came up;Did not enjoy the material;Did not enjoy the structure of the class;Was not prepared/not doing well","Did not have enough time;Personal issue came up;Was not prepared/not doing well","Did not have enough time;Was not prepared/not doing well","Did not have enough time;Did not enjoy the material;There was little engagement or feedback from instructors or TA;Did not enjoy the structure of the class","Did not have enough time","Was not prepared/not doing well","Other","Personal issue came up;Other","","Did not have enough time;Did not enjoy the material;Was not prepared/not doing well;Other","Did not enjoy the material;Did not enjoy the structure of the class","Did not have enough time;Personal issue came up;Did not enjoy the structure of the class","","","Low cost penalty for dropping;Did not enjoy the material;There was little engagement or feedback from instructors or TA;Did not enjoy the structure of the class","","Personal issue came up","","Did not have enough time;Personal issue came up","","Did not have enough time;Personal issue came up","","","","","Did not enjoy the material;There was little engagement or feedback from instructors or TA;Did not enjoy the structure of the class;Was not prepared/not doing well;Other","","","","There was little engagement or feedback from instructors or TA;Did not enjoy the structure of the class","Did not have enough time;Low cost penalty for dropping;Personal issue came up;Did not enjoy the material;Did not enjoy the structure of the class;Was not prepared/not doing well","Did not have enough time;Personal issue came up","","Did not have enough time","","Did not have enough time;Low cost penalty for dropping;Personal issue came up;Did not enjoy the material","Did not have enough time"]}]
     # with open('surveyData.json', 'w') as json_file:
     #     json.dump(surveyData, json_file)
+    # surveyPath is the JSON export or a directory holding several exports
+    surveyPath = surveyPath or dataDir + '/surveyData.json'
+
+    @pipeline.stage('survey', files=[surveyPath])
+    def survey():
+        return tabulateSurvey(loadSurvey(surveyPath))
 
-    # Opening JSON file that contains responses to student survey
-    f = open(os.path.normpath(root + os.sep + os.pardir)+'/data/surveyData.json')
-
-    # returns JSON object as a dictionary
-    surveyData = json.load(f)
-
-    # Create Bar Plots visualizing the background of students
-    fig = plt.figure(figsize=(12.5, 9.5))
-    gs = GridSpec(ncols=2, nrows=2, figure=fig)
-    ax_1 = fig.add_subplot(gs[0,0])
-    ax_1.set_title('% Students in Online/Trad')
-    ax_2 = fig.add_subplot(gs[0,1])
-    ax_2.set_title('% CS Students')
-    ax_3 = fig.add_subplot(gs[1,0])
-    ax_3.set_title('% Students with Prior Work Exp')
-    ax_4 = fig.add_subplot(gs[1,1])
-    ax_4.set_title('% Students Working')
-
-    for survey in surveyData:
-        if survey['id'] == '1626105223092':
-            for idx, s in enumerate(survey['answers']):
-                if s == '':
-                    survey['answers'][idx] = '0'
-                else:
-                    survey['answers'][idx] = survey['answers'][idx].replace(' years', '')
-
-            unique, count = np.unique(survey['answers'], return_counts=True)
-            idx = np.where(unique == '10+')[0][0]
-            val, c = unique[2], count[2]
-            unique, count = list(unique), list(count)
-            unique.remove(val)
-            unique.append(val)
-            count.remove(c)
-            count.append(c)
-            count = list(count / np.sum(count))
-
-            ax_3.bar(unique, count, color='b', width=0.7,
-                    edgecolor='black', alpha=0.6)
-            ax_3.set_xlabel('Years Work Experience')
-            ax_3.set_ylabel('Percentage Response')
-
-        elif survey['id'] == '1626105037244':
-            unique, count = np.unique(survey['answers'], return_counts=True)
-            count = list(count / np.sum(count))
-            ax_1.bar(unique, count, color='g', width=0.2,
-                    edgecolor='grey', alpha=0.6)
-            ax_1.set_xlabel('Program')
-            ax_1.set_ylabel('Percentage Response')
-
-        elif survey['id'] == '1626105078795':
-            for idx, s in enumerate(survey['answers']):
-                if 'Computer ' in s or s == 'Comp Sci' or s == 'HCI' or s == 'Cybersecurity' or 'Educational Technology' in s:
-                    survey['answers'][idx] = 'Computer Science'
-                else:
-                    survey['answers'][idx] = 'Other'
-
-            unique, count = np.unique(survey['answers'], return_counts=True)
-            count = list(count / np.sum(count))
-            ax_2.bar(unique, count, color='r', width=0.2,
-                    edgecolor='black', alpha=0.6)
-            ax_2.set_xlabel('Marriage Status')
-            ax_2.set_ylabel('Percentage Response')
-
-        elif survey['id'] == '1626104998715':
-            for idx, s in enumerate(survey['answers']):
-                if s == '':
-                    survey['answers'][idx] = '0'
-
-            unique, count = np.unique(survey['answers'], return_counts=True)
-            count = list(count / np.sum(count))
-            ax_4.bar(unique, count, color='orange', width=0.7,
-                     edgecolor='grey', alpha=0.6)
-            ax_4.set_xlabel('Number Working Hours/Week')
-            ax_4.set_ylabel('Percentage Response')
-
-        else:
-            pass
-
-    plt.tight_layout()
-    plt.savefig('Background_BarPlot.png')
-
-    # Create Bar Plots visualizing the results of 1-5 levels of students
-    fig = plt.figure(figsize=(15.5, 9.5))
-    gs = GridSpec(ncols=2, nrows=2, figure=fig)
-    ax_1 = fig.add_subplot(gs[0, 0])
-    ax_1.set_title('Interaction with Students/Teacher',size = 14)
-    ax_2 = fig.add_subplot(gs[0, 1])
-    ax_2.set_title('Satisfaction when High Interaction',size = 14)
-    ax_3 = fig.add_subplot(gs[1, 0])
-    ax_3.set_title('Course Engagement/Motivation',size = 14)
-    ax_4 = fig.add_subplot(gs[1, 1])
-    ax_4.set_title('Support Systems for Students',size = 14)
-    # ax_5 = fig.add_subplot(gs[1, 1])
-    # ax_5.set_title('% Students Working')
-    labels = ['Strongly Disagree', 'Disagree', 'Neutral', 'Agree', 'Strongly Agree']
-    for survey in surveyData:
-        unique, count = np.arange(5) + 1, np.zeros(5)
-        for idx, n in enumerate(unique):
-            count[idx] = len(np.where(np.array(survey['answers']) == str(n))[0])
-        count = list(count / np.sum(count))
-        if survey['id'] == '1626105482960':
-            ax_1.bar(labels, count, color='g', width=0.4,
-                     edgecolor='black', alpha=0.6)
-            ax_1.set_ylabel('Percentage Response',size = 14)
-            ax_1.set_ylim([0, 0.7])
-        elif survey['id'] == '1626105592894':
-            ax_2.bar(labels, count, color='b', width=0.4,
-                     edgecolor='black', alpha=0.6)
-            ax_2.set_ylim([0, 0.7])
-        elif survey['id'] == '1626105621816':
-            ax_3.bar(labels, count, color='r', width=0.4,
-                     edgecolor='black', alpha=0.6)
-            ax_3.set_ylabel('Percentage Response',size = 14)
-            ax_3.set_ylim([0, 0.7])
-        elif survey['id'] == '1626105652893':
-            ax_4.bar(labels, count, color='orange', width=0.4,
-                     edgecolor='black', alpha=0.6)
-            ax_4.set_ylim([0, 0.7])
-        else:
-            pass
-
-    plt.tight_layout()
-    plt.savefig('Satisfaction_BarPlot.png')
-
-    q16 = {'Weekly quizzes':0,
-           'Weekly status checks with instructors/TAs':0,
-           'Discussion boards to ask questions for instructors and other students':0,
-           'Detailed feedback from instructors/TAs on assignments':0,
-           'Other':0}
-    q17 = {'Course’s material had real world value': 0,
-           'Course was challenging': 0,
-           'Good communication with TAs/instructors': 0,
-           'Enjoyed the course structure (ie. projects, tests, number of HW assignments)': 0,
-           'Other': 0}
-    fig = plt.figure(figsize=(20.5, 9.5))
-    gs = GridSpec(ncols=2, nrows=1, figure=fig)
-    ax_1 = fig.add_subplot(gs[0, 0])
-    ax_1.set_title('Student Course Engagement Preference', size = 14)
-    ax_2 = fig.add_subplot(gs[0, 1])
-    ax_2.set_title('Student Course Satisfaction Preference',size = 14)
-
-    for survey in surveyData:
-        if survey['id'] == '1626105793308':
-            for responses in survey['answers']:
-                for response in responses.split(';'):
-                    q16[response] += 1
-
-        elif survey['id'] == '1626105894334':
-            for responses in survey['answers']:
-                for response in responses.split(';'):
-                    q17[response] += 1
-
-        else:
-            pass
-
-    ax_1.bar(['Quizzes', 'TA Status Check', 'Discussion Boards', 'Feedback from TA', 'Other'],
-             list(np.array(list(q16.values()))/len(survey['answers'])), color='green', width=0.4,
-             edgecolor='black', alpha=0.6)
-    ax_1.set_ylabel('Percentage Response', size = 12)
-    ax_1.set_xticklabels(['Quizzes', 'TA Status Check',
-                          'Discussion Boards', 'Feedback from TA', 'Other'],
-                         rotation=15)
-    ax_1.set_ylim([0, 1])
-
-    ax_2.bar(['Interesting Material', 'Challenging Course', 'Communication with TA', 'Good Course Structure', 'Other'],
-             list(np.array(list(q17.values())) / len(survey['answers'])), color='blue', width=0.4,
-             edgecolor='black', alpha=0.6)
-    ax_2.set_ylabel('Percentage Response', size = 12)
-    ax_2.set_xticklabels(['Interesting Material', 'Challenging Course',
-                          'Communication with TA', 'Good Course Structure', 'Other'],
-                         rotation=15)
-    ax_2.set_ylim([0, 1])
-
-    dropPercent = np.sum(np.array(surveyData[18]['answers']) == 'Yes')/len(surveyData[18]['answers'])
-
-    enjoyPercent = np.sum(np.array(surveyData[19]['answers']) == 'Yes') / \
-                   (len(surveyData[19]['answers']) - np.sum(np.array(surveyData[19]['answers']) == ''))
-
-    q20 = {'Did not have enough time': 0,
-           'Low cost penalty for dropping': 0,
-           'Did not enjoy the material': 0,
-           'There was little engagement or feedback from instructors or TA': 0,
-           'Personal issue came up': 0,
-           'Did not enjoy the structure of the class': 0,
-           'Was not prepared/not doing well':0,
-           'Other': 0}
-
-    for responses in surveyData[20]['answers']:
-        for response in responses.split(';'):
-            if response != '':
-                q20[response] += 1
-
-    for key, value in q20.items():
-        q20[key] = value/np.sum(np.array(surveyData[20]['answers']) != '')
-
-    plt.savefig('DropResults_BarPlot.png')
+    # Always runs; renderFigures skips every figure whose data and drawing code are unchanged
+    @pipeline.stage('render', deps=['merge', 'regressions', 'survey'], always=True)
+    def render(merged, fits, tables):
+        return renderFigures({'merged': merged, 'fits': fits, 'tables': tables}, visualDir, force=forceRender)
+
+    return pipeline
+
+
+def runAnalyze(pipeline, args):
+    outputs = pipeline.run(['regressions', 'permutation'], workers=args.workers, force=args.force)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 3):
+        print(outputs['regressions'].to_string(index=False))
+    print('permutation test p-val = {}'.format(outputs['permutation']['pvalue']))
+
+
+def runPlot(pipeline, args):
+    outputs = pipeline.run(['render'], workers=args.workers, force=args.force)
+    for fileName, status in outputs['render'].items():
+        print('{}: {}'.format(fileName, status))
+
+
+def runSurvey(pipeline, args):
+    outputs = pipeline.run(['survey'], workers=args.workers, force=args.force)
+    print(json.dumps(outputs['survey'], indent=1, default=float))
+
+
+def runRetention(pipeline, args):
+    outputs = pipeline.run(['cube', 'catalog'], workers=args.workers, force=args.force)
+    cube = RetentionCube.fromFrame(outputs['cube'], CourseCatalog.fromFrame(outputs['catalog']))
+    where = {key: wanted for key, wanted in [('Class', args.classes), ('Term', args.terms),
+                                             ('Teacher', args.teachers), ('Size', args.sizes)] if wanted}
+    if args.modality:
+        where['isOnline'] = int(args.modality == 'online')
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.precision', 2):
+        print(cube.query(by=args.by, where=where, values=args.values).to_string(index=False))
+
+
+def runScrape(pipeline, args):
+    outputs = pipeline.run(['scrape'], workers=args.workers, force=args.force)
+    print('{} courses scraped'.format(len(outputs['scrape'])))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache-dir', default=None,
+                        help='scrape cache directory (default: ../data/cache)')
+    parser.add_argument('--artifact-dir', default=None,
+                        help='where stage outputs are cached (default: ../data/artifacts)')
+    parser.add_argument('--force', action='store_true', help='rerun stages even if their artifacts are current')
+    parser.add_argument('--workers', type=int, default=4, help='number of stages to run at once')
+    parser.add_argument('--survey', default=None,
+                        help='survey export, or a directory of exports (default: ../data/surveyData.json)')
+    parser.add_argument('--report', default=None,
+                        help='timing and memory report path (default: ../data/reports/<time>-<command>.json)')
+    parser.add_argument('--profile', default=None, help='write a cProfile dump of the slowest stage to this path')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record tracemalloc peaks per stage (several times slower)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('analyze', help='retention regressions and permutation test')
+    commands.add_parser('plot', help='render the figures into ../visual')
+    commands.add_parser('survey', help='tabulate the student survey')
+    retentionParser = commands.add_parser('retention', help='withdrawal and grade means for any slice of the sections')
+    retentionParser.add_argument('--by', nargs='*', default=['Class'],
+                                 choices=['Class', 'Term', 'Teacher', 'isOnline', 'Size'], help='dimensions to group by')
+    retentionParser.add_argument('--class', dest='classes', nargs='+', help='only these classes, e.g. "CS 7641"')
+    retentionParser.add_argument('--term', dest='terms', nargs='+', help='only these terms, e.g. "Fall 2019"')
+    retentionParser.add_argument('--teacher', dest='teachers', nargs='+', help='only these teachers')
+    retentionParser.add_argument('--size', dest='sizes', nargs='+', help='only these section sizes')
+    retentionParser.add_argument('--modality', choices=['online', 'campus'], help='only online or on-campus sections')
+    retentionParser.add_argument('--values', nargs='+', default=['W%', 'GPA'], choices=GRADE_COLUMNS,
+                                 help='grade columns to average')
+    retentionParser.add_argument('--add-term', metavar='EXPORT',
+                                 help='merge a Course Critique export of new terms into the stored cells first')
+    scrapeParser = commands.add_parser('scrape', help='refresh the omscentral course scores with a browser')
+    scrapeParser.add_argument('--cache-ttl', type=int, default=7, help='days cached snapshots are kept')
+    args = parser.parse_args()
+
+    # Only the scrape command may start a browser; the others run from the scrape cache
+    # IMPORTANT TO CHECK YOUR Browser Version to make sure it matches the chromedriver
+    # This chromedriver version is for 95.0.4638.69
+    root = os.getcwd()
+    DRIVER_PATH = root + '/chromedriver'
+    parent = os.path.normpath(root + os.sep + os.pardir)
+    cache = SnapshotCache(args.cache_dir or parent + '/data/cache', ttlDays=getattr(args, 'cache_ttl', 7))
+    recorder = instrument.configure(traceMemory=args.trace_memory, profile=args.profile is not None)
+
+    pipeline = buildPipeline(parent + '/data', parent + '/visual', args.artifact_dir or parent + '/data/artifacts',
+                             cache, DRIVER_PATH, replay=args.command != 'scrape', refresh=args.command == 'scrape',
+                             surveyPath=args.survey, forceRender=args.force)
+    try:
+        if args.command == 'retention' and args.add_term:
+            print('{} stored as {}'.format(args.add_term, storeTerm(args.add_term, parent + '/data/terms')),
+                  file=sys.stderr)
+        {'analyze': runAnalyze, 'plot': runPlot, 'survey': runSurvey, 'retention': runRetention,
+         'scrape': runScrape}[args.command](pipeline, args)
+        if args.command == 'scrape':
+            print('{} expired cache objects removed'.format(cache.evict()), file=sys.stderr)
+    except CacheMiss as miss:
+        parser.exit(1, 'No cached scrape of {}; run "python CourseCritque.py scrape" first\n'.format(miss.args[0]))
+    finally:
+        reportPath = args.report or instrument.defaultReportPath(parent + '/data/reports', args.command)
+        recorder.writeReport(reportPath, profilePath=args.profile)
+        print('Timings written to {}'.format(reportPath), file=sys.stderr)
@@ -0,0 +1,135 @@
+# coding=utf8
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from CourseCritque import aggregateRetention, mergeCourses, parseCourseTable, tabulateSurvey
+from catalog import CourseCatalog
+from cube import RetentionCube, accumulateCube
+from figures import renderFigures
+from permutationTest import permutationTest
+from regression import regressionMatrix
+from surveyStore import loadSurvey
+from synthetic import courseCritiqueRows, courseTableRows, surveyPayload
+
+# (sections, respondents) at each scale; the first is the size of the collected data
+SCALES = [(669, 38), (10**4, 10**3), (10**5, 10**4), (10**6, 10**5)]
+
+
+def measure(func, *args):
+    """Run func(*args) and return (result, seconds, peak traced MB)."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def runScale(nSections, nRespondents, workDir, templatePath, nIter, nBoot, seed=0, log=print):
+    results = []
+
+    def record(stage, func, *args):
+        result, seconds, peak = measure(func, *args)
+        results.append({'stage': stage, 'sections': nSections, 'respondents': nRespondents,
+                        'seconds': round(seconds, 4), 'peakMB': round(peak, 2)})
+        if log:
+            log('{:>9} sections {:>7} respondents  {:<10} {:8.3f} s {:9.1f} MB'.format(
+                nSections, nRespondents, stage, seconds, peak))
+        return result
+
+    csvPath = os.path.join(workDir, 'CourseCritque-{}.csv'.format(nSections))
+    sections = courseCritiqueRows(nSections, seed=seed)
+    sections.to_csv(csvPath, index=False)
+    rows = courseTableRows(sections['Class'].unique(), seed=seed)
+    del sections
+    surveyPath = os.path.join(workDir, 'surveyData-{}.json'.format(nRespondents))
+    with open(surveyPath, 'w', encoding='utf-8') as f:
+        json.dump(surveyPayload(nRespondents, templatePath, seed=seed), f)
+
+    cells = record('ingest', lambda: accumulateCube(csvPath).toFrame())
+    catalog = CourseCatalog(sorted(cells['Class'].unique()))
+    cube = record('cube', RetentionCube.fromAccumulator, cells, catalog)
+    retention = record('aggregate', aggregateRetention, cube)
+    merged = record('merge', lambda: mergeCourses(retention, parseCourseTable(rows), catalog))
+    fits = record('regressions', lambda: regressionMatrix(merged, nBoot=nBoot, seed=seed))
+    record('permutation', lambda: permutationTest(retention[retention.isOnline == 1]['Retention'],
+                                                  retention[retention.isOnline == 0]['Retention'],
+                                                  nIter=nIter, alternative='greater', seed=seed))
+    tables = record('survey', lambda: tabulateSurvey(loadSurvey(surveyPath)))
+    record('render', lambda: renderFigures({'merged': merged, 'fits': fits, 'tables': tables},
+                                           os.path.join(workDir, 'visual'), workers=1, force=True))
+    return results
+
+
+def warmUp(workDir, templatePath):
+    """Run every stage once untimed on a tiny data set.
+
+    scipy and matplotlib are imported lazily and matplotlib builds its font cache on first use,
+    so without this the first scale would measure imports instead of the stages.
+    """
+    runScale(200, 20, workDir, templatePath, nIter=100, nBoot=10, log=None)
+
+
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(report, baselinePath):
+    with open(baselinePath, encoding='utf-8') as f:
+        baseline = json.load(f)
+    before = {(r['stage'], r['sections'], r['respondents']): r for r in baseline['results']}
+    print('\nChange against {} ({}):'.format(baselinePath, baseline['commit']))
+    for r in report['results']:
+        old = before.get((r['stage'], r['sections'], r['respondents']))
+        if old and old['seconds'] > 0:
+            print('{:>9} sections {:<10} time x{:.2f}  peak x{:.2f}'.format(
+                r['sections'], r['stage'], r['seconds'] / old['seconds'],
+                r['peakMB'] / old['peakMB'] if old['peakMB'] else float('nan')))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time every analysis stage on synthetic data (no browser needed)')
+    parser.add_argument('--scales', type=int, default=3,
+                        help='how many of the scales {} to run'.format(SCALES))
+    parser.add_argument('--n-iter', type=int, default=100000, help='permutations per test')
+    parser.add_argument('--n-boot', type=int, default=10000, help='bootstrap resamples for the regressions')
+    parser.add_argument('--output', default=None, help='report path (default: ../data/benchmarks/<commit>.json)')
+    parser.add_argument('--compare', default=None, help='earlier report to compare against')
+    args = parser.parse_args()
+
+    root = os.getcwd()
+    parent = os.path.normpath(root + os.sep + os.pardir)
+    commit = gitCommit()
+    report = {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+              'pandas': pd.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count(),
+              'nIter': args.n_iter, 'nBoot': args.n_boot, 'results': []}
+
+    with tempfile.TemporaryDirectory() as workDir:
+        warmUp(workDir, parent + '/data/surveyData.json')
+        for nSections, nRespondents in SCALES[:args.scales]:
+            report['results'] += runScale(nSections, nRespondents, workDir, parent + '/data/surveyData.json',
+                                          args.n_iter, args.n_boot)
+
+    output = args.output or os.path.join(parent, 'data', 'benchmarks', '{}.json'.format(commit))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print('Report written to {}'.format(output))
+    if args.compare:
+        compare(report, args.compare)
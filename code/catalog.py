@@ -0,0 +1,131 @@
+# coding=utf8
+import json
+import os
+import re
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+
+COURSE_ID = re.compile(r'^\s*([A-Za-z]+)[\s-]*(\d+[A-Za-z]?)(?:-([A-Za-z0-9]+))?\b')
+
+
+def courseKey(text):
+    """Canonical "DEPT NUMBER" form of a course id written as "CS-7641", "CS 7641" or "cs7641".
+
+    Special topics sections keep their suffix ("CS-8803-O08" is "CS 8803-O08"), since each
+    section is a different course.
+    """
+    match = COURSE_ID.match(str(text))
+    if not match:
+        raise ValueError('not a course id: {!r}'.format(text))
+    key = '{} {}'.format(match.group(1).upper(), match.group(2).upper())
+    return key + '-' + match.group(3).upper() if match.group(3) else key
+
+
+def readable(values):
+    """Mask of the values that are course ids; the others are named in a warning so callers can skip them."""
+    values = pd.Series(values).astype(str)
+    isId = {value: COURSE_ID.match(value) is not None for value in values.unique()}
+    mask = values.map(isId).to_numpy(dtype=bool)
+    if not mask.all():
+        warnings.warn('skipping unreadable course ids: {}'.format(
+            ', '.join(sorted(repr(value) for value, ok in isId.items() if not ok))))
+    return mask
+
+
+def omscentralId(key):
+    # omscentral writes course ids with a dash
+    return '-'.join(key.split(' '))
+
+
+def readCourseList(path):
+    """data/courses.csv, the omscentral course list, with its export quirks repaired.
+
+    The file is cp1252, every name ends in a stray non-breaking space and "f" (an icon glyph
+    in the copied table) and the reviews column header was saved truncated as "Revie...".
+    """
+    frame = pd.read_csv(path, encoding='cp1252')
+    frame = frame.rename(columns=lambda c: 'Reviews' if c.startswith('Revie') else c)
+    frame['Name'] = frame['Name'].str.replace('\xa0f$', '', regex=True).str.strip()
+    return frame
+
+
+class CourseCatalog:
+    """Every course seen in any source, numbered in the order it was first seen.
+
+    Ids are positions in keys, so they can index arrays directly; a catalog saved and loaded
+    again keeps its ids and only appends new courses.
+    """
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self.ids = {}
+        self.lock = threading.Lock()
+        for key in keys:
+            self.intern(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def intern(self, text):
+        key = courseKey(text)
+        with self.lock:
+            courseId = self.ids.get(key)
+            if courseId is None:
+                courseId = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+        return courseId
+
+    def encode(self, values):
+        """Course ids for a column of course id strings, parsing each distinct string once."""
+        codes, uniques = pd.factorize(pd.Series(values), sort=True)
+        if (codes < 0).any():
+            raise ValueError('missing course id')
+        return np.array([self.intern(u) for u in uniques], dtype=np.int32)[codes]
+
+    def decode(self, courseIds):
+        return np.array(self.keys, dtype=object)[np.asarray(courseIds)]
+
+    def frame(self):
+        return pd.DataFrame({'CourseId': np.arange(len(self.keys), dtype=np.int32), 'Class': self.keys,
+                             'Omscentral': [omscentralId(k) for k in self.keys]})
+
+    @classmethod
+    def fromFrame(cls, frame):
+        return cls(frame.sort_values('CourseId')['Class'])
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.keys, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+
+def buildCatalog(catalogPath, courseList, *courseColumns):
+    """Intern the courses of courses.csv and of every other column of course ids given.
+
+    Courses not in catalogPath yet are appended in sorted order and the file is rewritten;
+    values that are not course ids are skipped. Returns one row per course with CourseId,
+    Class, Omscentral, Name and Reviews.
+    """
+    catalog = CourseCatalog.load(catalogPath)
+    known = len(catalog)
+    courseList = courseList[readable(courseList['ID'])]
+    keys = set(courseList['ID'].map(courseKey))
+    for column in courseColumns:
+        values = pd.Series(pd.unique(pd.Series(column)))
+        keys.update(values[readable(values)].map(courseKey))
+    for key in sorted(keys):
+        catalog.intern(key)
+    if len(catalog) > known:
+        catalog.save(catalogPath)
+    names = pd.DataFrame({'CourseId': catalog.encode(courseList['ID']), 'Name': courseList['Name'],
+                          'Reviews': courseList['Reviews']})
+    return catalog.frame().merge(names, how='left', on='CourseId')
@@ -0,0 +1,136 @@
+# coding=utf8
+import datetime
+import os
+import numpy as np
+import pandas as pd
+from catalog import courseKey, readable
+from ingest import GRADE_COLUMNS, GroupAccumulator, categoryMask, readCourseCritique
+from pipeline import loadArtifact, saveArtifact
+
+DIMENSIONS = ['CourseId', 'Term', 'Teacher', 'isOnline', 'Size']
+TEXT_DIMENSIONS = ['Term', 'Teacher', 'Size']
+UNKNOWN = 'Unknown'
+
+
+def accumulateCube(path, chunksize=250000):
+    """Grade sums and counts of the Course Critique export per class, term, teacher, modality and size."""
+    accumulator = GroupAccumulator(['Class', 'Term', 'Teacher', 'isOnline', 'Size'], GRADE_COLUMNS)
+    for chunk in readCourseCritique(path, chunksize=chunksize):
+        for key in TEXT_DIMENSIONS:
+            # groupby drops missing keys, which would leave those sections out of every roll-up
+            if chunk[key].isna().any():
+                chunk[key] = chunk[key].cat.add_categories([UNKNOWN]).fillna(UNKNOWN)
+        accumulator.add(chunk)
+    return accumulator
+
+
+def storeTerm(exportPath, termsDir):
+    """Accumulate a newly released Course Critique export into termsDir and return the stored file name.
+
+    Files are named after the time they were added, so storedTerms() returns them in that order.
+    """
+    os.makedirs(termsDir, exist_ok=True)
+    name = '{}-{}'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S'),
+                          os.path.splitext(os.path.basename(exportPath))[0])
+    return saveArtifact(accumulateCube(exportPath).toFrame(), os.path.join(termsDir, name))
+
+
+def storedTerms(termsDir):
+    """The accumulateCube frames of the exports added with storeTerm, oldest first."""
+    if not os.path.isdir(termsDir):
+        return []
+    return [loadArtifact(os.path.join(termsDir, name)) for name in sorted(os.listdir(termsDir))
+            if not name.endswith('.tmp')]
+
+
+class RetentionCube:
+    """Mergeable grade sums and counts for every class x term x teacher x modality x size cell.
+
+    Queries filter and roll up the cells rather than the section rows, and a cube built from a
+    new term's export can be merged in with update() without rereading the earlier terms. Classes
+    are keyed by catalog course id; pass the catalog to query by class name.
+    """
+
+    def __init__(self, cells, catalog=None):
+        self.cells = cells
+        self.catalog = catalog
+
+    @classmethod
+    def fromAccumulator(cls, frame, catalog):
+        """Cube from the flat frame of accumulateCube(...).toFrame(), skipping classes that are not course ids."""
+        frame = frame[readable(frame['Class'])]
+        cells = frame.assign(CourseId=catalog.encode(frame['Class'])).drop(columns='Class')
+        return cls(cls._compact(cells), catalog)
+
+    @staticmethod
+    def _compact(cells):
+        cells = cells.groupby(DIMENSIONS, observed=True, sort=True).sum().reset_index()
+        for key in TEXT_DIMENSIONS:
+            cells[key] = cells[key].astype('category')
+        cells['CourseId'] = cells['CourseId'].astype(np.int32)
+        cells['isOnline'] = cells['isOnline'].astype(np.int8)
+        return cells
+
+    def toFrame(self):
+        return self.cells
+
+    @classmethod
+    def fromFrame(cls, frame, catalog=None):
+        return cls(frame, catalog)
+
+    def update(self, other, replaceTerms=True):
+        """Merge another cube, e.g. one built from a newly released term, into this one.
+
+        Course Critique exports are collected per course, so with replaceTerms only the cells of
+        the (course, term) pairs present in other are dropped first: a re-delivered course term
+        replaces its old numbers instead of being counted twice, and other courses keep theirs.
+        """
+        cells = self.cells
+        if replaceTerms:
+            pairs = pd.MultiIndex.from_frame(other.cells[['CourseId', 'Term']].astype({'Term': object}))
+            cells = cells[~pd.MultiIndex.from_frame(cells[['CourseId', 'Term']].astype({'Term': object})).isin(pairs)]
+        for key in TEXT_DIMENSIONS:
+            cells = cells.assign(**{key: cells[key].astype(object)})
+        merged = pd.concat([cells, other.cells.astype({key: object for key in TEXT_DIMENSIONS})], ignore_index=True)
+        self.cells = self._compact(merged)
+        return self
+
+    def _mask(self, key, wanted):
+        if key == 'Class':
+            key = 'CourseId'
+            wanted = [self.catalog.ids.get(courseKey(c), -1) for c in ([wanted] if isinstance(wanted, str) else wanted)]
+        column = self.cells[key]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            test = wanted if callable(wanted) else (lambda c: c.isin([wanted] if np.isscalar(wanted) else wanted))
+            return categoryMask(column, test)
+        if callable(wanted):
+            return np.asarray(wanted(column), dtype=bool)
+        return column.isin([wanted] if np.isscalar(wanted) else wanted).to_numpy()
+
+    def query(self, by=(), where=None, values=GRADE_COLUMNS):
+        """Section-weighted means of values per group of the by dimensions over the matching cells.
+
+        where maps a dimension to a value, a list of values or a predicate over the dimension's
+        values (a Series), e.g. {'Class': 'CS 7641', 'Size': lambda s: s.str.contains('Very Large')}.
+        'Class' may be used in by and where in place of CourseId. Returns the by columns, one
+        mean column per value and the number of sections behind each row.
+        """
+        by = list(by)
+        mask = np.ones(len(self.cells), dtype=bool)
+        for key, wanted in (where or {}).items():
+            mask &= self._mask(key, wanted)
+        cells = self.cells[mask]
+        groupBy = ['CourseId' if key == 'Class' else key for key in by]
+        columns = [v + ' sum' for v in values] + [v + ' count' for v in values]
+        if groupBy:
+            totals = cells.groupby(groupBy, observed=True)[columns].sum()
+        else:
+            totals = cells[columns].sum().to_frame().T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = pd.DataFrame({v: totals[v + ' sum'] / totals[v + ' count'] for v in values})
+        result['sections'] = totals[[v + ' count' for v in values]].max(axis=1).astype(np.int64)
+        result = result.reset_index(drop=not groupBy)
+        if 'Class' in by:
+            result = result.rename(columns={'CourseId': 'Class'})
+            result['Class'] = self.catalog.decode(result['Class'])
+        return result
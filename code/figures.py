@@ -0,0 +1,298 @@
+# coding=utf8
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import inspect
+import json
+import os
+import numpy as np
+import pandas as pd
+from regression import getFit
+
+# matplotlib and scipy are imported by the draw functions so only processes that render pay for them
+
+FigureSpec = namedtuple('FigureSpec', ['fileName', 'draw', 'inputs'])
+
+
+def _figure(figsize=None):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _densityPlot(ax, values, label, color):
+    # Histogram plus Gaussian KDE, the same picture the deprecated seaborn distplot drew
+    from scipy.stats import gaussian_kde
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    bins = min(50, max(1, int(round(np.sqrt(len(values))))))
+    ax.hist(values, bins=bins, density=True, color=color, alpha=0.4)
+    kde = gaussian_kde(values)
+    pad = 3 * kde.factor * values.std(ddof=1)
+    grid = np.linspace(values.min() - pad, values.max() + pad, 200)
+    ax.plot(grid, kde(grid), color=color, label=label)
+
+
+def drawRetentionDist(merged):
+    # Create density plots of traditional and online courses
+    fig = _figure()
+    ax = fig.add_subplot(111)
+    _densityPlot(ax, merged.Retention_Online, 'Online', 'C0')
+    _densityPlot(ax, merged.Retention_Trad, 'Trad', 'C1')
+    ax.set_xlabel('1-Retention Rate (%)')
+    ax.set_ylabel('Density')
+    ax.set_title('Online vs. Traditional Retention Rates')
+    ax.legend(loc = 'best')
+    return fig
+
+
+def drawRegressions(merged, fits):
+    # Create plots comparing traditional and online retention rates
+    # Create plots of online traditional rates vs. workload and difficulty of courses
+    fig = _figure(figsize=(13.5, 5.5))
+    ax1 = fig.add_subplot(131)
+    ax1.set_title('Trad vs. Online Retention', size=12)
+    ax2 = fig.add_subplot(132)
+    ax2.set_title('Online Retention vs. Workload', size=12)
+    ax3 = fig.add_subplot(133)
+    ax3.set_title('Online Retention vs. Difficulty', size=12)
+    ax1.plot(merged['Retention_Trad'], merged['Retention_Online'], marker="o", linestyle="", alpha=0.8, markersize=5, color='black',
+               markeredgecolor='none')
+    fit = getFit(fits, 'Retention_Trad', 'Retention_Online')
+    ax1.plot(merged['Retention_Trad'], fit['slope'] * merged['Retention_Trad'] + fit['intercept'])
+    ax1.text(5, 35, 'rsq = {}'.format(round(fit['rsq'], 3)), fontsize=11)
+    ax1.text(5, 33.5, 'p-val = {}'.format(round(fit['p'], 2)), fontsize=11)
+    ax1.set_xlabel('1-Traditional Retention Rate(%)')
+    ax1.set_ylabel('1-Online Retention Rate(%)')
+
+    ax2.plot(merged['Retention_Online'], merged['Workload'], marker="o", linestyle="", alpha=0.8, markersize=5, color='black',
+             markeredgecolor='none')
+    fit = getFit(fits, 'Retention_Online', 'Workload')
+    ax2.plot(merged['Retention_Online'], fit['slope'] * merged['Retention_Online'] + fit['intercept'])
+    ax2.text(15, 27, 'rsq = {}'.format(round(fit['rsq'], 3)), fontsize=11)
+    ax2.text(15, 26, 'p-val = {}'.format(round(fit['p'], 3)), fontsize=11)
+    ax2.set_xlabel('1-Online Retention Rate(%)')
+    ax2.set_ylabel('Workload (hrs/wk)')
+
+    ax3.plot(merged['Retention_Online'], merged['Difficulty'], marker="o", linestyle="", alpha=0.8, markersize=5,
+             color='black', markeredgecolor='none')
+    fit = getFit(fits, 'Retention_Online', 'Difficulty')
+    ax3.plot(merged['Retention_Online'], fit['slope'] * merged['Retention_Online'] + fit['intercept'])
+    ax3.text(30, 2.75, 'rsq = {}'.format(round(fit['rsq'], 3)), fontsize=11)
+    ax3.text(30, 2.65, 'p-val = {}'.format(round(fit['p'], 3)), fontsize=11)
+    ax3.set_xlabel('1-Online Retention Rate(%)')
+    ax3.set_ylabel('Difficulty (1-5)')
+    fig.tight_layout()
+    return fig
+
+
+def drawHighDropRate(merged):
+    # Get the top 5 classes in terms of retention rates
+    # Create bar plot
+    top5 = merged.sort_values('Retention_Online', ascending=False).head()
+    rt_Online = list(top5['Retention_Online'])
+    rt_Trad = list(top5['Retention_Trad'])
+    br1 = np.arange(len(rt_Online))
+    barWidth = 0.25
+    br2 = [x + barWidth for x in br1]
+
+    fig = _figure()
+    ax = fig.add_subplot(111)
+    ax.bar(br1, rt_Online, color='b', width=barWidth,
+           edgecolor='grey', label='Online', alpha = 0.6)
+    ax.bar(br2, rt_Trad, color='g', width=barWidth,
+           edgecolor='grey', label='Traditional', alpha = 0.6)
+    ax.set_xlabel('Courses')
+    ax.set_ylabel('1-Retention Rate(%)')
+    ax.set_title('Top 5 Lowest Online Retention Rates')
+    ax.set_xticks([r + barWidth for r in range(len(rt_Online))])
+    ax.set_xticklabels(list(top5['Class']))
+    ax.legend(loc = 'best')
+    return fig
+
+
+def drawBackground(tables):
+    from matplotlib.gridspec import GridSpec
+
+    # Create Bar Plots visualizing the background of students
+    fig = _figure(figsize=(12.5, 9.5))
+    gs = GridSpec(ncols=2, nrows=2, figure=fig)
+    ax_1 = fig.add_subplot(gs[0,0])
+    ax_1.set_title('% Students in Online/Trad')
+    ax_2 = fig.add_subplot(gs[0,1])
+    ax_2.set_title('% CS Students')
+    ax_3 = fig.add_subplot(gs[1,0])
+    ax_3.set_title('% Students with Prior Work Exp')
+    ax_4 = fig.add_subplot(gs[1,1])
+    ax_4.set_title('% Students Working')
+
+    ax_3.bar(*tables['experience'], color='b', width=0.7,
+            edgecolor='black', alpha=0.6)
+    ax_3.set_xlabel('Years Work Experience')
+    ax_3.set_ylabel('Percentage Response')
+
+    ax_1.bar(*tables['program'], color='g', width=0.2,
+            edgecolor='grey', alpha=0.6)
+    ax_1.set_xlabel('Program')
+    ax_1.set_ylabel('Percentage Response')
+
+    ax_2.bar(*tables['subject'], color='r', width=0.2,
+            edgecolor='black', alpha=0.6)
+    ax_2.set_xlabel('Marriage Status')
+    ax_2.set_ylabel('Percentage Response')
+
+    ax_4.bar(*tables['working'], color='orange', width=0.7,
+             edgecolor='grey', alpha=0.6)
+    ax_4.set_xlabel('Number Working Hours/Week')
+    ax_4.set_ylabel('Percentage Response')
+
+    fig.tight_layout()
+    return fig
+
+
+def drawSatisfaction(tables):
+    from matplotlib.gridspec import GridSpec
+
+    # Create Bar Plots visualizing the results of 1-5 levels of students
+    fig = _figure(figsize=(15.5, 9.5))
+    gs = GridSpec(ncols=2, nrows=2, figure=fig)
+    ax_1 = fig.add_subplot(gs[0, 0])
+    ax_1.set_title('Interaction with Students/Teacher',size = 14)
+    ax_2 = fig.add_subplot(gs[0, 1])
+    ax_2.set_title('Satisfaction when High Interaction',size = 14)
+    ax_3 = fig.add_subplot(gs[1, 0])
+    ax_3.set_title('Course Engagement/Motivation',size = 14)
+    ax_4 = fig.add_subplot(gs[1, 1])
+    ax_4.set_title('Support Systems for Students',size = 14)
+    labels = ['Strongly Disagree', 'Disagree', 'Neutral', 'Agree', 'Strongly Agree']
+
+    ax_1.bar(labels, tables['1626105482960'], color='g', width=0.4,
+             edgecolor='black', alpha=0.6)
+    ax_1.set_ylabel('Percentage Response',size = 14)
+    ax_1.set_ylim([0, 0.7])
+    ax_2.bar(labels, tables['1626105592894'], color='b', width=0.4,
+             edgecolor='black', alpha=0.6)
+    ax_2.set_ylim([0, 0.7])
+    ax_3.bar(labels, tables['1626105621816'], color='r', width=0.4,
+             edgecolor='black', alpha=0.6)
+    ax_3.set_ylabel('Percentage Response',size = 14)
+    ax_3.set_ylim([0, 0.7])
+    ax_4.bar(labels, tables['1626105652893'], color='orange', width=0.4,
+             edgecolor='black', alpha=0.6)
+    ax_4.set_ylim([0, 0.7])
+
+    fig.tight_layout()
+    return fig
+
+
+def drawPreferences(tables):
+    from matplotlib.gridspec import GridSpec
+
+    fig = _figure(figsize=(20.5, 9.5))
+    gs = GridSpec(ncols=2, nrows=1, figure=fig)
+    ax_1 = fig.add_subplot(gs[0, 0])
+    ax_1.set_title('Student Course Engagement Preference', size = 14)
+    ax_2 = fig.add_subplot(gs[0, 1])
+    ax_2.set_title('Student Course Satisfaction Preference',size = 14)
+
+    ax_1.bar(['Quizzes', 'TA Status Check', 'Discussion Boards', 'Feedback from TA', 'Other'],
+             tables['engagement'], color='green', width=0.4,
+             edgecolor='black', alpha=0.6)
+    ax_1.set_ylabel('Percentage Response', size = 12)
+    ax_1.set_xticks(range(5))
+    ax_1.set_xticklabels(['Quizzes', 'TA Status Check',
+                          'Discussion Boards', 'Feedback from TA', 'Other'],
+                         rotation=15)
+    ax_1.set_ylim([0, 1])
+
+    ax_2.bar(['Interesting Material', 'Challenging Course', 'Communication with TA', 'Good Course Structure', 'Other'],
+             tables['satisfaction'], color='blue', width=0.4,
+             edgecolor='black', alpha=0.6)
+    ax_2.set_ylabel('Percentage Response', size = 12)
+    ax_2.set_xticks(range(5))
+    ax_2.set_xticklabels(['Interesting Material', 'Challenging Course',
+                          'Communication with TA', 'Good Course Structure', 'Other'],
+                         rotation=15)
+    ax_2.set_ylim([0, 1])
+
+    return fig
+
+
+FIGURES = [
+    FigureSpec('RetentionDist.png', drawRetentionDist, ['merged']),
+    FigureSpec('LinearRegPlots.png', drawRegressions, ['merged', 'fits']),
+    FigureSpec('HighDropRateBarPlot.png', drawHighDropRate, ['merged']),
+    FigureSpec('Background_BarPlot.png', drawBackground, ['tables']),
+    FigureSpec('Satisfaction_BarPlot.png', drawSatisfaction, ['tables']),
+    # The drop reasons are tabulated but not plotted; this file holds the preference plots
+    FigureSpec('DropResults_BarPlot.png', drawPreferences, ['tables']),
+]
+
+
+def _hashValue(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(json.dumps(list(map(str, value.columns))).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=float).encode('utf-8'))
+
+
+def figureHash(spec, inputs):
+    """Hash of a figure's spec (file name and drawing code) and of the data it is drawn from."""
+    digest = hashlib.sha256(spec.fileName.encode('utf-8'))
+    for f in (spec.draw, _figure, _densityPlot, getFit):
+        digest.update(inspect.getsource(f).encode('utf-8'))
+    for name in spec.inputs:
+        _hashValue(digest, inputs[name])
+    return digest.hexdigest()
+
+
+def _render(spec, args, path):
+    fig = spec.draw(*args)
+    fig.savefig(path + '.tmp.png')
+    os.replace(path + '.tmp.png', path)
+    return spec.fileName
+
+
+def renderFigures(inputs, outDir, workers=None, force=False, figures=FIGURES):
+    """Render every figure whose data or spec changed since it was last written to outDir.
+
+    inputs maps the names in each FigureSpec.inputs to their data. Hashes of the last rendered
+    version of each file are kept in outDir/.figures.json. Stale figures are drawn in a process
+    pool. Returns {file name: 'rendered' or 'up to date'}.
+    """
+    os.makedirs(outDir, exist_ok=True)
+    manifestPath = os.path.join(outDir, '.figures.json')
+    manifest = {}
+    if os.path.exists(manifestPath):
+        with open(manifestPath, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    status, stale = {}, []
+    for spec in figures:
+        key = figureHash(spec, inputs)
+        path = os.path.join(outDir, spec.fileName)
+        if not force and manifest.get(spec.fileName) == key and os.path.exists(path):
+            status[spec.fileName] = 'up to date'
+        else:
+            stale.append((spec, key, path))
+
+    if len(stale) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=min(len(stale), workers or os.cpu_count())) as executor:
+            futures = [executor.submit(_render, spec, [inputs[n] for n in spec.inputs], path)
+                       for spec, key, path in stale]
+            for future in futures:
+                future.result()
+    else:
+        for spec, key, path in stale:
+            _render(spec, [inputs[n] for n in spec.inputs], path)
+
+    for spec, key, path in stale:
+        manifest[spec.fileName] = key
+        status[spec.fileName] = 'rendered'
+    with open(manifestPath + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(manifestPath + '.tmp', manifestPath)
+    return status
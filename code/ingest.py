@@ -0,0 +1,65 @@
+# coding=utf8
+import numpy as np
+import pandas as pd
+
+# Sections taught through the online program
+ONLINE_SECTIONS = ['O03', 'O01']
+
+GRADE_COLUMNS = ['GPA', 'A%', 'B%', 'C%', 'D%', 'F%', 'W%']
+COLUMN_DTYPES = dict({'Class': 'category', 'Section': 'category', 'Term': 'category',
+                      'Size': 'category', 'Teacher': 'category'},
+                     **{c: 'float32' for c in GRADE_COLUMNS})
+
+
+def categoryMask(column, test):
+    """Row mask of a categorical column whose category passes test (a Series -> bool array function).
+
+    test runs once per category instead of once per row and is mapped back through the codes.
+    """
+    hit = np.append(np.asarray(test(column.cat.categories), dtype=bool), False)
+    return hit[column.cat.codes.to_numpy()]
+
+
+def readCourseCritique(path, chunksize=250000):
+    """Yield the Course Critique export in chunks with categorical text columns.
+
+    Each chunk gets an int8 isOnline column.
+    """
+    for chunk in pd.read_csv(path, encoding='utf-8', chunksize=chunksize, dtype=COLUMN_DTYPES):
+        chunk['isOnline'] = categoryMask(chunk['Section'], lambda c: c.isin(ONLINE_SECTIONS)).astype('int8')
+        yield chunk
+
+
+class GroupAccumulator:
+    """Running sum and count of value columns grouped by key columns.
+
+    Chunks are added one at a time and the state never holds more than one row per group, so
+    memory does not grow with the number of input rows.
+    """
+
+    def __init__(self, keys, values, state=None):
+        self.keys = list(keys)
+        self.values = list(values)
+        self.state = state
+
+    def add(self, frame):
+        grouped = frame.groupby(self.keys, observed=True)[self.values]
+        part = pd.concat([grouped.sum().astype('float64').add_suffix(' sum'),
+                          grouped.count().add_suffix(' count')], axis=1)
+        part = part.reset_index()
+        for key in self.keys:
+            # Chunks have their own category sets, so compare groups by value
+            if isinstance(part[key].dtype, pd.CategoricalDtype):
+                part[key] = part[key].astype(object)
+        self._combine(part.set_index(self.keys))
+        return self
+
+    def _combine(self, part):
+        if self.state is None:
+            self.state = part
+        else:
+            self.state = pd.concat([self.state, part]).groupby(level=self.keys).sum()
+
+    def toFrame(self):
+        """Flat frame with the keys plus '<value> sum' and '<value> count' columns."""
+        return self.state.reset_index()
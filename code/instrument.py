@@ -0,0 +1,159 @@
+# coding=utf8
+from contextlib import contextmanager
+import cProfile
+import datetime
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows has no getrusage; reports then leave the resident set size out
+    resource = None
+
+
+def maxRssMB():
+    """Peak resident set size of the process so far, or None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class Recorder:
+    """Collects wall time and memory peaks of named stages.
+
+    Stages nest per thread, so a stage opened inside another is recorded as "outer/inner".
+    Repeated stages with the same path (e.g. every scroll of a page) are folded into one
+    entry with a call count. Every stage records the process's peak resident set size so far,
+    which is nearly free. traceMemory=True adds tracemalloc peaks per stage, at the cost of
+    slowing Python allocations down several times. These peaks are process-wide: a nested
+    stage's peak includes its parent's so far, and a stage that overlapped another on a
+    different thread is flagged concurrent and its peak includes both. With profile=True top-level stages run under cProfile
+    one at a time, since only one profiler can be active at once; a stage that starts while another
+    is being profiled is only timed. The slowest profiled stage can be dumped.
+    """
+
+    def __init__(self, traceMemory=False, profile=False):
+        self.traceMemory = traceMemory
+        self.profile = profile
+        self.started = datetime.datetime.now()
+        self.startClock = time.perf_counter()
+        self.records = {}
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.active = 0
+        self.profiling = False
+        if traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        stack = self.local.__dict__.setdefault('stack', [])
+        path = '/'.join(stack + [name])
+        topLevel = not stack
+        with self.lock:
+            # active counts open top-level stages, including this stage's own when nested
+            concurrent = self.active > (0 if topLevel else 1)
+            if self.traceMemory and self.active == 0:
+                tracemalloc.reset_peak()
+            if topLevel:
+                self.active += 1
+            profiling = self.profile and topLevel and not self.profiling
+            if profiling:
+                self.profiling = True
+        profiler = None
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            if profiling:
+                try:
+                    profiler = cProfile.Profile()
+                    profiler.enable()
+                except ValueError:
+                    # another profiling tool, e.g. a debugger, already holds the interpreter's profiler
+                    profiler = None
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            stack.pop()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20 if self.traceMemory else None
+            rss = maxRssMB()
+            with self.lock:
+                concurrent = concurrent or self.active > 1
+                if topLevel:
+                    self.active -= 1
+                if profiling:
+                    self.profiling = False
+                record = self.records.setdefault(path, {'name': path, 'calls': 0, 'seconds': 0.0,
+                                                        'maxSeconds': 0.0, 'peakMB': None, 'maxRssMB': None,
+                                                        'concurrent': False})
+                record['calls'] += 1
+                record['seconds'] += seconds
+                record['maxSeconds'] = max(record['maxSeconds'], seconds)
+                if peak is not None:
+                    record['peakMB'] = max(record['peakMB'] or 0.0, peak)
+                if rss is not None:
+                    record['maxRssMB'] = max(record['maxRssMB'] or 0.0, rss)
+                record['concurrent'] = record['concurrent'] or concurrent
+                if profiler and (path not in self.profiles or seconds > self.profiles[path][0]):
+                    self.profiles[path] = (seconds, profiler)
+
+    def report(self):
+        stages = sorted(self.records.values(), key=lambda r: -r['seconds'])
+        return {'started': self.started.isoformat(timespec='seconds'),
+                'command': sys.argv,
+                'totalSeconds': round(time.perf_counter() - self.startClock, 4),
+                'stages': [dict(r, seconds=round(r['seconds'], 4), maxSeconds=round(r['maxSeconds'], 4),
+                                peakMB=None if r['peakMB'] is None else round(r['peakMB'], 2),
+                                maxRssMB=None if r['maxRssMB'] is None else round(r['maxRssMB'], 1)) for r in stages]}
+
+    def writeReport(self, path, profilePath=None):
+        """Write the JSON report, plus a pstats dump of the slowest top-level stage if profiling."""
+        report = self.report()
+        if profilePath and self.profiles:
+            slowest = max(self.profiles, key=lambda p: self.profiles[p][0])
+            self.profiles[slowest][1].dump_stats(profilePath)
+            report['profile'] = {'stage': slowest, 'path': profilePath}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        return report
+
+
+# Recorder used by stage() and timed() below; replaced by configure() at the start of a run
+recorder = Recorder()
+
+
+def configure(traceMemory=False, profile=False):
+    global recorder
+    recorder = Recorder(traceMemory=traceMemory, profile=profile)
+    return recorder
+
+
+def stage(name):
+    return recorder.stage(name)
+
+
+def timed(name=None):
+    """Decorator form of stage(), named after the function by default."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with recorder.stage(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def defaultReportPath(reportDir, command):
+    return os.path.join(reportDir, '{}-{}.json'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), command))
@@ -0,0 +1,78 @@
+# coding=utf8
+from collections import namedtuple
+from itertools import combinations
+from math import comb
+import numpy as np
+
+PermutationResult = namedtuple('PermutationResult', ['statistic', 'pvalue', 'nPerm', 'exact'])
+
+
+def _pvalue(permDiffs, trueDiff, alternative):
+    # Small tolerance so ties with the observed statistic are counted despite float rounding
+    tol = 1e-12 * max(1.0, abs(trueDiff))
+    if alternative == 'greater':
+        return int(np.count_nonzero(permDiffs >= trueDiff - tol))
+    elif alternative == 'less':
+        return int(np.count_nonzero(permDiffs <= trueDiff + tol))
+    return int(np.count_nonzero(np.abs(permDiffs) >= abs(trueDiff) - tol))
+
+
+def permutationTest(x, y, nIter=10000, alternative='two-sided', seed=None, chunkSize=None,
+                    exact='auto', maxExact=200000, maxChunkBytes=64 * 2**20):
+    """Permutation test for the difference in means, mean(x) - mean(y).
+
+    Permuted group labels are built chunkSize rows at a time as a (chunkSize, n) matrix so
+    memory stays bounded no matter how large nIter is. Only the sum of the first group is
+    needed per permutation since the second group's sum is the pooled total minus it.
+
+    alternative is 'two-sided', 'greater' (mean(x) > mean(y)) or 'less'. With exact=True, or
+    exact='auto' and at most maxExact label assignments, every split is enumerated instead.
+    """
+    if alternative not in ('two-sided', 'greater', 'less'):
+        raise ValueError("alternative must be 'two-sided', 'greater' or 'less'")
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    pooled = np.concatenate([x, y])
+    nx, n = len(x), len(x) + len(y)
+    if nx == 0 or nx == n:
+        raise ValueError('both groups need at least one observation')
+
+    total = pooled.sum()
+    trueDiff = x.mean() - y.mean()
+    nSplits = comb(n, nx)
+    if exact == 'auto':
+        exact = nSplits <= maxExact
+
+    if chunkSize is None:
+        chunkSize = max(1, maxChunkBytes // (8 * n))
+
+    hits = 0
+    if exact:
+        # Enumerate every way of choosing the x group, chunkSize splits at a time
+        splits = combinations(range(n), nx)
+        nPerm = nSplits
+        while True:
+            idx = np.fromiter((i for split in _take(splits, chunkSize) for i in split), dtype=np.intp)
+            if len(idx) == 0:
+                break
+            sumX = pooled[idx.reshape(-1, nx)].sum(axis=1)
+            hits += _pvalue(sumX / nx - (total - sumX) / (n - nx), trueDiff, alternative)
+        return PermutationResult(float(trueDiff), hits / nPerm, nPerm, True)
+
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < nIter:
+        rows = min(chunkSize, nIter - done)
+        labels = rng.permuted(np.broadcast_to(pooled, (rows, n)), axis=1)
+        sumX = labels[:, :nx].sum(axis=1)
+        hits += _pvalue(sumX / nx - (total - sumX) / (n - nx), trueDiff, alternative)
+        done += rows
+
+    # Count the observed labelling as one of the permutations so the p-value is never zero
+    return PermutationResult(float(trueDiff), (hits + 1) / (nIter + 1), nIter, False)
+
+
+def _take(iterator, n):
+    for _, item in zip(range(n), iterator):
+        yield item
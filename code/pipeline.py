@@ -0,0 +1,270 @@
+# coding=utf8
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import hashlib
+import inspect
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import instrument
+
+try:
+    import pyarrow  # noqa: F401
+    FRAME_FORMAT = 'parquet'
+except ImportError:
+    FRAME_FORMAT = 'pkl'
+
+# Modules loaded from this directory are the repo's own code; their source is part of stage keys
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def logStatus(message):
+    # Status lines go to stderr so a command's stdout holds only its result
+    print(message, file=sys.stderr)
+
+
+def hashFile(path, blockSize=2**20):
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        # A directory hashes as the names and contents of the files in it
+        for dirPath, dirNames, fileNames in os.walk(path):
+            dirNames.sort()
+            for name in sorted(fileNames):
+                filePath = os.path.join(dirPath, name)
+                digest.update(os.path.relpath(filePath, path).encode('utf-8'))
+                digest.update(hashFile(filePath).encode('utf-8'))
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blockSize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def saveArtifact(value, basePath):
+    """Write a stage output next to basePath and return the file name.
+
+    DataFrames go to Parquet (pickle if pyarrow is not installed), dicts of arrays to NPZ and
+    anything else to JSON.
+    """
+    if isinstance(value, pd.DataFrame):
+        path = basePath + '.' + FRAME_FORMAT
+        if FRAME_FORMAT == 'parquet':
+            value.to_parquet(path + '.tmp')
+        else:
+            value.to_pickle(path + '.tmp', compression=None)
+    elif isinstance(value, dict) and value and all(isinstance(v, np.ndarray) for v in value.values()):
+        path = basePath + '.npz'
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **value)
+    else:
+        path = basePath + '.json'
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(value, f, indent=1, default=_toJson)
+    os.replace(path + '.tmp', path)
+    return os.path.basename(path)
+
+
+def loadArtifact(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    elif path.endswith('.pkl'):
+        return pd.read_pickle(path, compression=None)
+    elif path.endswith('.npz'):
+        with np.load(path) as npz:
+            return {k: npz[k] for k in npz.files}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _toJson(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError('cannot store {!r} in a JSON artifact'.format(type(value)))
+
+
+def _isLocal(module):
+    path = getattr(module, '__file__', None)
+    return path is not None and os.path.abspath(path).startswith(CODE_DIR + os.sep)
+
+
+def _names(code):
+    # Global names read by a code object and by the lambdas, comprehensions and functions nested in it
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _names(const)
+    return names
+
+
+def _localModules(modules):
+    # Close a set of repo modules over the repo modules they import from
+    pending, seen = list(modules), set()
+    while pending:
+        module = pending.pop()
+        if module in seen:
+            continue
+        seen.add(module)
+        for value in vars(module).values():
+            owner = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+            if owner is not None and owner not in seen and _isLocal(owner):
+                pending.append(owner)
+    return seen
+
+
+def codeDependencies(func):
+    """Source snippets and repo modules that func depends on.
+
+    Functions and classes defined next to func contribute their own source, following the
+    names they use in turn, and module constants they read contribute their repr. Anything
+    that comes from another repo module pulls in that whole module and the repo modules it
+    imports, so constants and helpers there are covered too.
+    """
+    home = inspect.getmodule(func)
+    sources, modules, seen = {}, set(), set()
+    pending = [func]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        module = inspect.getmodule(obj)
+        if module is not home:
+            if module is not None and _isLocal(module):
+                modules.add(module)
+            continue
+        sources[obj.__qualname__] = inspect.getsource(obj)
+        functions = [obj] if inspect.isfunction(obj) else [f for f in vars(obj).values() if inspect.isfunction(f)]
+        for function in functions:
+            values = [(None, c.cell_contents) for c in function.__closure__ or ()]
+            values += [(n, function.__globals__[n]) for n in _names(function.__code__) if n in function.__globals__]
+            for name, value in values:
+                if inspect.ismodule(value):
+                    if _isLocal(value):
+                        modules.add(value)
+                elif inspect.isfunction(value) or inspect.isclass(value):
+                    pending.append(value)
+                elif name and isinstance(value, (str, int, float, list, tuple, dict)):
+                    sources[name] = repr(value)
+    return sources, _localModules(modules)
+
+
+class Stage:
+    def __init__(self, name, func, deps, files, always):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.files = list(files)
+        self.always = always
+
+    def codeHash(self):
+        sources, modules = codeDependencies(self.func)
+        digest = hashlib.sha256()
+        for name in sorted(sources):
+            digest.update(name.encode('utf-8'))
+            digest.update(sources[name].encode('utf-8'))
+        for module in sorted(modules, key=lambda m: m.__name__):
+            digest.update(module.__name__.encode('utf-8'))
+            digest.update(hashFile(module.__file__).encode('utf-8'))
+        return digest.hexdigest()
+
+
+class Pipeline:
+    """Named stages whose outputs are cached as artifacts under artifactDir.
+
+    A stage's key hashes its code and the repo code it uses (see codeDependencies), the files it
+    reads, the run parameters and the content of its dependencies' artifacts. A stage only runs
+    when no artifact exists for its key; stages marked always=True run every time, but their
+    dependants are still skipped when the new output hashes the same as before. Stages whose
+    dependencies are done run concurrently on a thread pool.
+    """
+
+    def __init__(self, artifactDir, params=None):
+        self.artifactDir = artifactDir
+        self.params = params or {}
+        self.stages = {}
+        self.manifestPath = os.path.join(artifactDir, 'manifest.json')
+
+    def stage(self, name, deps=(), files=(), always=False):
+        def register(func):
+            self.stages[name] = Stage(name, func, deps, files, always)
+            return func
+        return register
+
+    def _order(self, targets):
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            order.append(name)
+
+        for name in targets:
+            visit(name)
+        return order
+
+    def _key(self, stage, depHashes):
+        digest = hashlib.sha256()
+        digest.update(stage.codeHash().encode('utf-8'))
+        digest.update(json.dumps(self.params, sort_keys=True, default=str).encode('utf-8'))
+        for path in stage.files:
+            digest.update(hashFile(path).encode('utf-8'))
+        for dep in stage.deps:
+            digest.update(depHashes[dep].encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _loadManifest(self):
+        if os.path.exists(self.manifestPath):
+            with open(self.manifestPath, encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def run(self, targets=None, workers=4, force=False, log=logStatus):
+        """Run the targets (default: every stage) and their dependencies, returning {name: output}."""
+        os.makedirs(self.artifactDir, exist_ok=True)
+        order = self._order(targets or list(self.stages))
+        manifest = self._loadManifest()
+        outputs, contentHashes, pending, running = {}, {}, list(order), {}
+
+        def execute(stage):
+            with instrument.stage(stage.name):
+                return runStage(stage)
+
+        def runStage(stage):
+            key = self._key(stage, contentHashes)
+            entry = manifest.get(stage.name)
+            if not force and not stage.always and entry and entry['key'] == key \
+                    and os.path.exists(os.path.join(self.artifactDir, entry['file'])):
+                return stage.name, loadArtifact(os.path.join(self.artifactDir, entry['file'])), entry, 'up to date'
+            value = stage.func(*[outputs[dep] for dep in stage.deps])
+            fileName = saveArtifact(value, os.path.join(self.artifactDir, '{}-{}'.format(stage.name, key)))
+            entry = {'key': key, 'file': fileName,
+                     'content': hashFile(os.path.join(self.artifactDir, fileName))}
+            return stage.name, value, entry, 'ran'
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for name in [n for n in pending if all(d in outputs for d in self.stages[n].deps)]:
+                    pending.remove(name)
+                    running[executor.submit(execute, self.stages[name])] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    name, value, entry, status = future.result()
+                    log('{}: {}'.format(name, status))
+                    old = manifest.get(name)
+                    if old and old['file'] != entry['file'] and os.path.exists(os.path.join(self.artifactDir, old['file'])):
+                        os.remove(os.path.join(self.artifactDir, old['file']))
+                    manifest[name] = entry
+                    outputs[name] = value
+                    contentHashes[name] = entry['content']
+
+        with open(self.manifestPath + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(self.manifestPath + '.tmp', self.manifestPath)
+        return outputs
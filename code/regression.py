@@ -0,0 +1,84 @@
+# coding=utf8
+import numpy as np
+import pandas as pd
+
+METRICS = ['Retention_Online', 'Retention_Trad', 'Difficulty', 'Workload', 'Satisfaction']
+
+
+def _pairStats(values, valid):
+    """Count, means, covariance and variances for every pair of columns over the rows where both are present.
+
+    values has missing entries zeroed and valid marks the present ones; both are (..., n, p) so
+    a whole stack of bootstrap resamples goes through the same batched matrix products. Results are
+    (..., p, p) with [i, j] describing column i over the rows where i and j are both present.
+    """
+    validT = np.swapaxes(valid, -1, -2)
+    valuesT = np.swapaxes(values, -1, -2)
+    count = validT @ valid
+    sums = valuesT @ valid
+    squares = (valuesT * valuesT) @ valid
+    products = valuesT @ values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / count
+        cov = products - sums * np.swapaxes(sums, -1, -2) / count
+        var = squares - sums * sums / count
+    return count, means, cov, var
+
+
+def _fits(count, means, cov, var):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # slope[i, j] regresses column j on column i
+        slope = cov / var
+        intercept = np.swapaxes(means, -1, -2) - slope * means
+        r = cov / np.sqrt(var * np.swapaxes(var, -1, -2))
+    return slope, intercept, r
+
+
+def regressionMatrix(frame, columns=METRICS, nBoot=10000, ci=0.95, seed=0, maxChunkBytes=64 * 2**20):
+    """OLS fit of every metric on every other metric, with percentile bootstrap intervals.
+
+    Each pair uses the rows where both metrics are present. All pairs are fit at once from
+    cross-product matrices, and the bootstrap resamples rows with an index matrix, fitting a
+    chunk of resamples per batched matrix product. Returns one row per (x, y) pair with n, slope,
+    intercept, r, rsq, the two-sided p-value of the slope and the interval bounds for slope
+    and rsq.
+    """
+    from scipy.stats import t
+
+    raw = frame[list(columns)].to_numpy(dtype=float)
+    valid = ~np.isnan(raw)
+    values = np.where(valid, raw, 0.0)
+    valid = valid.astype(float)
+    n, p = raw.shape
+
+    count, means, cov, var = _pairStats(values, valid)
+    slope, intercept, r = _fits(count, means, cov, var)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tStat = r * np.sqrt((count - 2) / (1 - r * r))
+    pValue = 2 * t.sf(np.abs(tStat), count - 2)
+
+    bootSlope = np.empty((nBoot, p, p))
+    bootRsq = np.empty((nBoot, p, p))
+    rng = np.random.default_rng(seed)
+    chunkSize = max(1, maxChunkBytes // (8 * n * p * 4))
+    for start in range(0, nBoot, chunkSize):
+        stop = min(nBoot, start + chunkSize)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        s, _, rb = _fits(*_pairStats(values[idx], valid[idx]))
+        bootSlope[start:stop] = s
+        bootRsq[start:stop] = rb * rb
+
+    alpha = (1 - ci) / 2
+    with np.errstate(invalid='ignore'):
+        slopeLow, slopeHigh = np.nanquantile(bootSlope, [alpha, 1 - alpha], axis=0)
+        rsqLow, rsqHigh = np.nanquantile(bootRsq, [alpha, 1 - alpha], axis=0)
+
+    i, j = np.where(~np.eye(p, dtype=bool))
+    return pd.DataFrame({'x': np.array(columns)[i], 'y': np.array(columns)[j], 'n': count[i, j].astype(int),
+                         'slope': slope[i, j], 'intercept': intercept[i, j], 'r': r[i, j], 'rsq': r[i, j] ** 2,
+                         'p': pValue[i, j], 'slope_low': slopeLow[i, j], 'slope_high': slopeHigh[i, j],
+                         'rsq_low': rsqLow[i, j], 'rsq_high': rsqHigh[i, j]})
+
+
+def getFit(fits, x, y):
+    return fits[(fits.x == x) & (fits.y == y)].iloc[0]
@@ -0,0 +1,245 @@
+# coding=utf8
+from array import array
+import argparse
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+REVIEW_FIELDS = ['Class', 'DateTime', 'Review', 'Semester', 'Difficulty', 'Satisfaction', 'Workload']
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+NUMBER = r'(-?\d+(?:\.\d+)?)'
+ARRAYS = ['postings', 'postingOffsets', 'termDocPtr', 'termDocs', 'termCounts',
+          'docStart', 'docLength', 'docClass', 'docSemester', 'docDifficulty', 'docSatisfaction', 'docWorkload']
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def encodeVarint(values):
+    """Pack non-negative integers into 7-bit groups, low group first, high bit set on all but the last."""
+    values = np.asarray(values, dtype=np.uint64)
+    nBytes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        nBytes += rest > 0
+        rest >>= np.uint64(7)
+    starts = np.cumsum(nBytes) - nBytes
+    out = np.empty(int(nBytes.sum()), dtype=np.uint8)
+    for k in range(int(nBytes.max(initial=0))):
+        take = nBytes > k
+        group = (values[take] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = np.where(nBytes[take] > k + 1, 0x80, 0).astype(np.uint64)
+        out[starts[take] + k] = (group | more).astype(np.uint8)
+    return out
+
+
+def decodeVarint(data):
+    data = np.asarray(data, dtype=np.uint8)
+    last = (data & 0x80) == 0
+    value = np.cumsum(last) - last
+    shift = np.arange(len(data)) - np.flatnonzero(np.r_[True, last[:-1]])[value]
+    out = np.zeros(int(last.sum()), dtype=np.int64)
+    for k in range(int(shift.max(initial=-1)) + 1):
+        at = shift == k
+        out[value[at]] |= (data[at] & 0x7f).astype(np.int64) << (7 * k)
+    return out
+
+
+def _numbers(values):
+    return pd.to_numeric(pd.Series(values, dtype=object).astype(str).str.extract(NUMBER)[0],
+                         errors='coerce').to_numpy(dtype=np.float32)
+
+
+class ReviewIndex:
+    """Positional inverted index and term x review count matrix over the scraped reviews.
+
+    Every token gets a global position; reviews are laid end to end with one unused position
+    between them, so a phrase can never match across two reviews. The inverted index stores
+    each term's positions as varint-encoded gaps, and the count matrix is stored in CSR layout
+    with one row per term. Both are saved as .npy files and memory-mapped by load().
+    """
+
+    def __init__(self, terms, classes, semesters, arrays):
+        self.terms = terms
+        self.classes = classes
+        self.semesters = semesters
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def nReviews(self):
+        return len(self.docStart)
+
+    @classmethod
+    def build(cls, reviews):
+        """Index an iterable of review dicts (REVIEW_FIELDS) in one pass."""
+        vocabulary, tokens, lengths = {}, array('i'), array('i')
+        classIds, semesterIds, classes, semesters = array('i'), array('i'), {}, {}
+        scores = {'Difficulty': [], 'Satisfaction': [], 'Workload': []}
+        for review in reviews:
+            ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(review['Review'] or '')]
+            tokens.extend(ids)
+            lengths.append(len(ids))
+            classIds.append(classes.setdefault(review['Class'], len(classes)))
+            semesterIds.append(semesters.setdefault(review['Semester'], len(semesters)))
+            for field, column in scores.items():
+                column.append(review[field])
+
+        termIds = np.frombuffer(tokens, dtype=np.int32) if tokens else np.empty(0, dtype=np.int32)
+        docLength = np.frombuffer(lengths, dtype=np.int32) if lengths else np.empty(0, dtype=np.int32)
+        nTerms, nDocs = len(vocabulary), len(docLength)
+        docStart = np.cumsum(docLength + 1, dtype=np.int64) - (docLength + 1)
+        docOf = np.repeat(np.arange(nDocs, dtype=np.int64), docLength)
+        positions = np.arange(len(termIds), dtype=np.int64) + docOf
+
+        # A stable sort keeps each term's positions in increasing order
+        order = np.argsort(termIds, kind='stable')
+        sortedTerms, sortedPositions = termIds[order], positions[order]
+        termStart = np.searchsorted(sortedTerms, np.arange(nTerms + 1))
+        gaps = np.diff(sortedPositions, prepend=-1)
+        gaps[termStart[:-1]] = sortedPositions[termStart[:-1]] + 1
+        postings = encodeVarint(gaps)
+        gapEnds = np.flatnonzero((postings & 0x80) == 0) + 1
+        postingOffsets = np.r_[0, gapEnds][termStart].astype(np.int64)
+
+        pairs, counts = np.unique(sortedTerms.astype(np.int64) * max(nDocs, 1) + docOf[order], return_counts=True)
+        termDocPtr = np.searchsorted(pairs // max(nDocs, 1), np.arange(nTerms + 1)).astype(np.int64)
+
+        arrays = {'postings': postings, 'postingOffsets': postingOffsets, 'termDocPtr': termDocPtr,
+                  'termDocs': (pairs % max(nDocs, 1)).astype(np.int32), 'termCounts': counts.astype(np.int32),
+                  'docStart': docStart, 'docLength': docLength.copy(),
+                  'docClass': np.frombuffer(classIds, dtype=np.int32).copy() if classIds else np.empty(0, np.int32),
+                  'docSemester': np.frombuffer(semesterIds, dtype=np.int32).copy() if semesterIds else np.empty(0, np.int32)}
+        for field, column in scores.items():
+            arrays['doc' + field] = _numbers(column)
+        return cls(list(vocabulary), list(classes), list(semesters), arrays)
+
+    def save(self, indexDir):
+        os.makedirs(indexDir, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(indexDir, name + '.npy'), getattr(self, name))
+        with open(os.path.join(indexDir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'terms': self.terms, 'classes': self.classes, 'semesters': self.semesters}, f)
+
+    @classmethod
+    def load(cls, indexDir):
+        with open(os.path.join(indexDir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(indexDir, name + '.npy'), mmap_mode='r') for name in ARRAYS}
+        return cls(meta['terms'], meta['classes'], meta['semesters'], arrays)
+
+    def matrix(self):
+        """The term x review count matrix as a scipy CSR matrix sharing the stored arrays."""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.termCounts, self.termDocs, self.termDocPtr), shape=(len(self.terms), self.nReviews))
+
+    def positions(self, term):
+        """Global positions of every occurrence of term."""
+        termId = self.vocabulary.get(term)
+        if termId is None:
+            return np.empty(0, dtype=np.int64)
+        start, stop = self.postingOffsets[termId], self.postingOffsets[termId + 1]
+        return np.cumsum(decodeVarint(self.postings[start:stop])) - 1
+
+    def occurrences(self, query):
+        """(review ids, hit counts) of the reviews containing the term or phrase."""
+        words = tokenize(query)
+        if len(words) == 1:
+            termId = self.vocabulary.get(words[0])
+            if termId is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            start, stop = self.termDocPtr[termId], self.termDocPtr[termId + 1]
+            return np.asarray(self.termDocs[start:stop], dtype=np.int64), np.asarray(self.termCounts[start:stop], dtype=np.int64)
+        # A phrase starts at p when word i occurs at p + i for every i
+        starts = self.positions(words[0]) if words else np.empty(0, dtype=np.int64)
+        for i, word in enumerate(words[1:], 1):
+            if not len(starts):
+                break
+            starts = np.intersect1d(starts, self.positions(word) - i, assume_unique=True)
+        docs = np.searchsorted(self.docStart, starts, side='right') - 1
+        return np.unique(docs, return_counts=True)
+
+    def lookup(self, query):
+        """One row per review containing the term or phrase, with its class, semester, scores and hit count."""
+        docs, hits = self.occurrences(query)
+        return pd.DataFrame({'review': docs, 'Class': np.array(self.classes, dtype=object)[self.docClass[docs]],
+                             'Semester': np.array(self.semesters, dtype=object)[self.docSemester[docs]],
+                             'Difficulty': self.docDifficulty[docs], 'Satisfaction': self.docSatisfaction[docs],
+                             'Workload': self.docWorkload[docs], 'hits': hits})
+
+    def _groups(self, by):
+        if by == 'Class':
+            return np.asarray(self.docClass), self.classes
+        if by == 'Semester':
+            return np.asarray(self.docSemester), self.semesters
+        raise ValueError('cannot group reviews by {!r}'.format(by))
+
+    def termFrequencies(self, queries, by='Class', perThousand=False):
+        """Occurrences of each term or phrase per class (or semester); a groups x queries frame.
+
+        With perThousand the counts are divided by the group's total tokens and scaled to 1000.
+        """
+        groups, labels = self._groups(by)
+        table = {}
+        for query in queries:
+            docs, hits = self.occurrences(query)
+            table[query] = np.bincount(groups[docs], weights=hits, minlength=len(labels))
+        frame = pd.DataFrame(table, index=pd.Index(labels, name=by))
+        if perThousand:
+            tokens = np.bincount(groups, weights=self.docLength, minlength=len(labels))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frame = frame.div(tokens, axis=0) * 1000
+        return frame
+
+    def satisfaction(self, queries, by=None, low=2):
+        """Satisfaction of the reviews that mention each term or phrase against those that do not.
+
+        Returns one row per query (and per class or semester if by is given) with the number of
+        reviews mentioning it, their mean satisfaction and share rated low (<= low), and the same
+        two numbers for the other reviews in the group. Reviews without a score are left out.
+        """
+        scores = np.asarray(self.docSatisfaction, dtype=np.float64)
+        rated = ~np.isnan(scores)
+        groups, labels = self._groups(by) if by else (np.zeros(self.nReviews, dtype=np.int64), [None])
+        nGroups = len(labels)
+        total = np.bincount(groups[rated], minlength=nGroups)
+        totalSum = np.bincount(groups[rated], weights=scores[rated], minlength=nGroups)
+        totalLow = np.bincount(groups[rated], weights=scores[rated] <= low, minlength=nGroups)
+        rows = []
+        for query in queries:
+            docs = self.occurrences(query)[0]
+            docs = docs[rated[docs]]
+            n = np.bincount(groups[docs], minlength=nGroups)
+            scoreSum = np.bincount(groups[docs], weights=scores[docs], minlength=nGroups)
+            lowCount = np.bincount(groups[docs], weights=scores[docs] <= low, minlength=nGroups)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rows.append(pd.DataFrame({'query': query, 'reviews': n, 'satisfaction': scoreSum / n,
+                                          'lowShare': lowCount / n,
+                                          'otherSatisfaction': (totalSum - scoreSum) / (total - n),
+                                          'otherLowShare': (totalLow - lowCount) / (total - n)}, index=labels))
+        frame = pd.concat(rows)
+        if by:
+            return frame.rename_axis(by).reset_index()
+        return frame.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Query the review index built by scrapeReviews.py')
+    parser.add_argument('queries', nargs='+', help='terms or quoted phrases, e.g. time TA "group project"')
+    parser.add_argument('--index-dir', default=None, help='index directory (default: ../data/reviewIndex)')
+    parser.add_argument('--by', choices=['Class', 'Semester'], default=None,
+                        help='break the satisfaction comparison down by class or semester')
+    parser.add_argument('--low', type=float, default=2, help='satisfaction at or below this counts as low')
+    args = parser.parse_args()
+
+    parent = os.path.normpath(os.getcwd() + os.sep + os.pardir)
+    index = ReviewIndex.load(args.index_dir or parent + '/data/reviewIndex')
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.precision', 3):
+        print(index.termFrequencies(args.queries, by=args.by or 'Class', perThousand=True))
+        print()
+        print(index.satisfaction(args.queries, by=args.by, low=args.low))
@@ -0,0 +1,152 @@
+# coding=utf8
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import pandas as pd
+from reviewIndex import REVIEW_FIELDS
+
+COURSE_ID = re.compile(r'^[A-Z]{2,5}[- ]?\d{4}')
+SEMESTER = re.compile(r'\b(Spring|Summer|Fall)\b', re.IGNORECASE)
+NUMBER = re.compile(r'\d')
+
+
+class MalformedReview(ValueError):
+    pass
+
+
+def reviewHash(text):
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()[:20]
+
+
+def _timestamp(text):
+    stamp = pd.to_datetime(text, errors='coerce')
+    return None if pd.isna(stamp) else stamp.tz_localize(None) if stamp.tzinfo else stamp
+
+
+def parseReview(text):
+    """Split the text of one review element into REVIEW_FIELDS, or raise MalformedReview.
+
+    The element reads class, date, review, semester, difficulty, satisfaction and workload
+    line by line. The review may span several lines, so it runs up to the last line naming a
+    semester; after that come difficulty, satisfaction (absent on some reviews) and workload,
+    the last line. Each field is checked for the shape it should have.
+    """
+    lines = [line.strip() for line in text.strip().split('\n')]
+    if len(lines) < 6:
+        raise MalformedReview('{} lines'.format(len(lines)))
+    if not COURSE_ID.match(lines[0]):
+        raise MalformedReview('no course id in {!r}'.format(lines[0]))
+    if _timestamp(lines[1]) is None:
+        raise MalformedReview('no date in {!r}'.format(lines[1]))
+    semesterLines = [i for i in range(3, len(lines)) if SEMESTER.search(lines[i])]
+    if not semesterLines:
+        raise MalformedReview('no semester')
+    semester = semesterLines[-1]
+    scores = lines[semester + 1:]
+    if len(scores) < 2 or not all(NUMBER.search(s) for s in (scores[0], scores[-1])):
+        raise MalformedReview('expected difficulty, satisfaction and workload after the semester')
+    satisfaction = scores[1] if len(scores) > 2 else 'None'
+    return dict(zip(REVIEW_FIELDS, [lines[0], lines[1], '\n'.join(lines[2:semester]), lines[semester],
+                                    scores[0], satisfaction, scores[-1]]))
+
+
+class ReviewStore:
+    """Append-only review files per course, deduplicated by a hash of the review text.
+
+    storeDir holds <course>.jsonl with one parsed review per line, quarantine.jsonl with the
+    texts that could not be parsed, and state.json with the newest review date stored for
+    each course (its watermark). Review files are only appended to and state.json is replaced
+    atomically after each course, so a crashed run loses at most the reviews it had not appended
+    yet.
+    """
+
+    def __init__(self, storeDir):
+        self.storeDir = storeDir
+        self.statePath = os.path.join(storeDir, 'state.json')
+        self.lock = threading.Lock()
+        self.hashes = {}
+        os.makedirs(storeDir, exist_ok=True)
+        if os.path.exists(self.statePath):
+            with open(self.statePath, encoding='utf-8') as f:
+                self.state = json.load(f)
+        else:
+            self.state = {}
+
+    def _path(self, course):
+        return os.path.join(self.storeDir, '{}.jsonl'.format(course))
+
+    def _records(self, path):
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def _known(self, course):
+        with self.lock:
+            if course not in self.hashes:
+                self.hashes[course] = {r['hash'] for r in self._records(self._path(course))}
+                self.hashes[course] |= {r['hash'] for r in self._records(os.path.join(self.storeDir, 'quarantine.jsonl'))
+                                        if r['course'] == course}
+            return self.hashes[course]
+
+    def watermark(self, course):
+        stamp = self.state.get(course, {}).get('watermark')
+        return pd.Timestamp(stamp) if stamp else None
+
+    def isKnown(self, course):
+        """Predicate telling whether a review text of course is already stored or older than its watermark."""
+        known = self._known(course)
+        watermark = self.watermark(course)
+
+        def check(text):
+            if reviewHash(text) in known:
+                return True
+            lines = text.strip().split('\n')
+            stamp = _timestamp(lines[1]) if len(lines) > 1 else None
+            return watermark is not None and stamp is not None and stamp < watermark
+        return check
+
+    def add(self, course, texts, fetched=None):
+        """Append the new reviews of course, quarantining malformed ones; returns (added, quarantined)."""
+        fetched = fetched or datetime.date.today().isoformat()
+        known = self._known(course)
+        added, quarantined = [], []
+        for text in texts:
+            digest = reviewHash(text)
+            if digest in known:
+                continue
+            known.add(digest)
+            try:
+                added.append(dict(parseReview(text), hash=digest, fetched=fetched))
+            except MalformedReview as error:
+                quarantined.append({'course': course, 'hash': digest, 'fetched': fetched, 'reason': str(error),
+                                    'text': text})
+        for path, records in [(self._path(course), added), (os.path.join(self.storeDir, 'quarantine.jsonl'), quarantined)]:
+            if records:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(r) + '\n' for r in records)
+        if added:
+            newest = max(_timestamp(r['DateTime']) for r in added)
+            entry = self.state.setdefault(course, {'watermark': None, 'reviews': 0})
+            if entry['watermark'] is None or newest > pd.Timestamp(entry['watermark']):
+                entry['watermark'] = newest.isoformat()
+            entry['reviews'] += len(added)
+            with open(self.statePath + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=1, sort_keys=True)
+            os.replace(self.statePath + '.tmp', self.statePath)
+        return len(added), len(quarantined)
+
+    def courses(self):
+        return sorted(name[:-len('.jsonl')] for name in os.listdir(self.storeDir)
+                      if name.endswith('.jsonl') and name != 'quarantine.jsonl')
+
+    def reviews(self, courses=None):
+        for course in courses or self.courses():
+            yield from self._records(self._path(course))
+
+    def frame(self, courses=None):
+        return pd.DataFrame(list(self.reviews(courses)), columns=REVIEW_FIELDS + ['hash', 'fetched'])
@@ -0,0 +1,125 @@
+# coding=utf8
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+
+class CacheMiss(KeyError):
+    pass
+
+
+class SnapshotCache:
+    """On-disk cache of scraped pages.
+
+    Each fetch stores the raw page payload and the parsed rows as gzipped, content-addressed
+    objects (named by their sha256, so identical snapshots are only stored once). index.json
+    maps "<url> <fetch date>" to the two object hashes. Entries ttlDays old or older are served
+    only in replay mode (so ttlDays=0 always refetches) and are removed by evict(), which keeps
+    the newest entry of each url so replay still works.
+    """
+
+    def __init__(self, cacheDir, ttlDays=7):
+        self.cacheDir = cacheDir
+        self.ttl = datetime.timedelta(days=ttlDays)
+        self.indexPath = os.path.join(cacheDir, 'index.json')
+        if os.path.exists(self.indexPath):
+            with open(self.indexPath, encoding='utf-8') as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+        # Scrapes may run on several threads at once; the lock serialises index updates
+        self.lock = threading.Lock()
+
+    def _objectPath(self, digest):
+        return os.path.join(self.cacheDir, 'objects', digest[:2], digest + '.gz')
+
+    def _putObject(self, data):
+        raw = data.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._objectPath(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmpPath = '{}.{}.tmp'.format(path, threading.get_ident())
+            with gzip.open(tmpPath, 'wb') as f:
+                f.write(raw)
+            os.replace(tmpPath, path)
+        return digest
+
+    def _getObject(self, digest):
+        with gzip.open(self._objectPath(digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def _saveIndex(self):
+        os.makedirs(self.cacheDir, exist_ok=True)
+        with open(self.indexPath + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(self.indexPath + '.tmp', self.indexPath)
+
+    def put(self, url, payload, rows, fetchDate=None):
+        fetchDate = fetchDate or datetime.date.today()
+        payloadHash, rowsHash = self._putObject(payload), self._putObject(json.dumps(rows))
+        with self.lock:
+            self.index['{} {}'.format(url, fetchDate.isoformat())] = {
+                'url': url,
+                'fetched': fetchDate.isoformat(),
+                'payload': payloadHash,
+                'rows': rowsHash,
+            }
+            self._saveIndex()
+
+    def _latest(self, url):
+        with self.lock:
+            entries = [e for e in self.index.values() if e['url'] == url]
+        return max(entries, key=lambda e: e['fetched']) if entries else None
+
+    def _isFresh(self, entry, today=None):
+        today = today or datetime.date.today()
+        return today - datetime.date.fromisoformat(entry['fetched']) < self.ttl
+
+    def get(self, url, ignoreTtl=False):
+        entry = self._latest(url)
+        if entry is None or not (ignoreTtl or self._isFresh(entry)):
+            return None
+        return {'url': url, 'fetched': entry['fetched'],
+                'payload': self._getObject(entry['payload']),
+                'rows': json.loads(self._getObject(entry['rows']))}
+
+    def evict(self, today=None):
+        """Drop expired entries but the newest of each url and delete objects no longer referenced."""
+        with self.lock:
+            newest = {}
+            for key, entry in self.index.items():
+                if entry['url'] not in newest or entry['fetched'] > self.index[newest[entry['url']]]['fetched']:
+                    newest[entry['url']] = key
+            keep = set(newest.values())
+            self.index = {k: e for k, e in self.index.items() if k in keep or self._isFresh(e, today)}
+            self._saveIndex()
+            live = {e[field] for e in self.index.values() for field in ('payload', 'rows')}
+        objectsDir = os.path.join(self.cacheDir, 'objects')
+        removed = 0
+        for dirPath, _, files in os.walk(objectsDir):
+            for name in files:
+                if name.endswith('.gz') and name[:-3] not in live:
+                    os.remove(os.path.join(dirPath, name))
+                    removed += 1
+        return removed
+
+
+def cachedScrape(cache, url, scrape, replay=False, refresh=False):
+    """Return the parsed rows for url from the cache, calling scrape(url) -> (payload, rows) on a miss.
+
+    In replay mode the newest snapshot is used regardless of age and a miss raises CacheMiss
+    instead of starting a browser. With refresh the page is scraped and stored even if a fresh
+    snapshot exists.
+    """
+    entry = None if refresh and not replay else cache.get(url, ignoreTtl=replay)
+    if entry is not None:
+        return entry['rows']
+    if replay:
+        raise CacheMiss(url)
+    payload, rows = scrape(url)
+    cache.put(url, payload, rows)
+    return rows
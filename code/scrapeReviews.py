@@ -1,51 +1,167 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-import time
-import numpy as np
-import pandas as pd
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
 import os
+import sys
+import argparse
+from scrapeCache import CacheMiss, SnapshotCache, cachedScrape
+from reviewIndex import ReviewIndex
+from reviewStore import ReviewStore
+from catalog import readCourseList
+import instrument
 
-if __name__ == '__main__':
+BASE_URL = 'https://omscentral.com'
+REVIEW_CLASS = 'jss22'
 
-    root = os.getcwd()
-    DRIVER_PATH = root + '/chromedriver'
-    driver = webdriver.Chrome(executable_path=DRIVER_PATH)
 
+def makeDriver(driverPath, headless=True):
     options = Options()
-    options.headless = True
+    options.headless = headless
     options.add_argument("--window-size=1920,1200")
+    with instrument.stage('chrome startup'):
+        return webdriver.Chrome(options=options, executable_path=driverPath)
+
+
+def scrollUntilStable(driver, className=REVIEW_CLASS, timeout=10, maxScrolls=1000, isKnown=None):
+    # Reviews are loaded as the page is scrolled, so keep jumping to the bottom until
+    # no new review elements show up within the timeout. Reviews are listed newest first,
+    # so once isKnown(text) holds for a loaded review everything below it is stored already
+    count = 0
+    for i in range(maxScrolls):
+        loaded = driver.find_elements_by_class_name(className)
+        if isKnown and any(isKnown(e.text) for e in loaded[count:]):
+            break
+        count = len(loaded)
+        with instrument.stage('scroll'):
+            driver.execute_script('window.scrollTo(0, document.body.scrollHeight)')
+            try:
+                WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+                    lambda d: len(d.find_elements_by_class_name(className)) > count)
+            except TimeoutException:
+                break
+    return driver.find_elements_by_class_name(className)
+
+
+def scrapeReviewPage(driver, url, timeout=10, isKnown=None):
+    with instrument.stage('page load'):
+        driver.get(url)
+        try:
+            WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CLASS_NAME, REVIEW_CLASS)))
+        except TimeoutException:
+            # Course has no reviews yet
+            return driver.page_source, []
+    reviews = scrollUntilStable(driver, timeout=timeout, isKnown=isKnown)
+    return driver.page_source, [review.text for review in reviews]
+
+
+def scrapeCourses(courses, cache, driverFactory, baseUrl=BASE_URL, nWorkers=4, replay=False, timeout=10, store=None):
+    """Scrape the review page of every course, nWorkers courses at a time.
 
-    # Get individual course reviews (these were the top 5 lowest retention rate courses)
-    courses = ['CS-6210', 'CS-7641', 'CS-6601', 'CSE-6250', 'CS-6262']
-    driver = webdriver.Chrome(options=options, executable_path=DRIVER_PATH)
+    Each worker thread borrows a driver from a shared pool and returns it when its course is
+    done, so at most nWorkers browsers are started. Cached pages never start a browser. With a
+    ReviewStore, scrolling stops at the first review the store already has; those pages are
+    always fetched live and not cached, since they only hold the reviews new to the store.
+    Returns {course: [review text, ...]}.
+    """
+    idle = queue.Queue()
+    started = []
+    lock = threading.Lock()
 
-    #Loop through courses and grab the reviews
-    reviewList = []
-    for course in courses:
-        driver.get("https://omscentral.com/reviews?course={}".format(course))
+    def scrape(url, isKnown=None):
+        try:
+            driver = idle.get_nowait()
+        except queue.Empty:
+            driver = driverFactory()
+            with lock:
+                started.append(driver)
+        try:
+            return scrapeReviewPage(driver, url, timeout=timeout, isKnown=isKnown)
+        finally:
+            idle.put(driver)
 
-        driver.implicitly_wait(3)
+    def scrapeCourse(course):
+        url = "{}/reviews?course={}".format(baseUrl.rstrip('/'), course)
+        isKnown = store.isKnown(course) if store else None
+        with instrument.stage(course):
+            if store and not replay:
+                return course, scrape(url, isKnown)
+            return course, cachedScrape(cache, url, scrape, replay=replay)
+
+    try:
+        with ThreadPoolExecutor(max_workers=nWorkers) as executor:
+            return dict(executor.map(scrapeCourse, courses))
+    finally:
+        for driver in started:
+            driver.quit()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--replay', action='store_true',
+                        help='build the reviews from the scrape cache only, without starting a browser')
+    parser.add_argument('--cache-dir', default=None,
+                        help='scrape cache directory (default: ../data/cache)')
+    parser.add_argument('--cache-ttl', type=int, default=7, help='days before a cached scrape is refetched')
+    parser.add_argument('--courses', nargs='+', default=None, help='course IDs to scrape, e.g. CS-7641')
+    parser.add_argument('--catalog', action='store_true',
+                        help='scrape every course listed in ../data/courses.csv')
+    parser.add_argument('--workers', type=int, default=4, help='number of browsers to run at once')
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help='site to scrape, e.g. a local static copy served with python -m http.server')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds to wait for new reviews to load')
+    parser.add_argument('--store-dir', default=None, help='review store directory (default: ../data/reviews)')
+    parser.add_argument('--full', action='store_true',
+                        help='scroll every page to the end instead of stopping at stored reviews')
+    parser.add_argument('--index-dir', default=None,
+                        help='where to write the review text index (default: ../data/reviewIndex)')
+    parser.add_argument('--report', default=None,
+                        help='timing and memory report path (default: ../data/reports/<time>-reviews.json)')
+    parser.add_argument('--profile', default=None, help='write a cProfile dump of the slowest course to this path')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record tracemalloc peaks per stage (several times slower)')
+    args = parser.parse_args()
+    recorder = instrument.configure(traceMemory=args.trace_memory, profile=args.profile is not None)
+
+    root = os.getcwd()
+    DRIVER_PATH = root + '/chromedriver'
+    dataDir = os.path.normpath(root + os.sep + os.pardir) + '/data'
+    cache = SnapshotCache(args.cache_dir or dataDir + '/cache', ttlDays=args.cache_ttl)
+    store = ReviewStore(args.store_dir or dataDir + '/reviews')
 
-        for i in range(0, 60):
-            driver.execute_script('window.scrollBy(0, 1000)')
-            time.sleep(1)
+    # Get individual course reviews (by default the top 5 lowest retention rate courses)
+    if args.courses:
+        courses = args.courses
+    elif args.catalog:
+        courses = list(readCourseList(dataDir + '/courses.csv')['ID'])
+    else:
+        courses = ['CS-6210', 'CS-7641', 'CS-6601', 'CSE-6250', 'CS-6262']
 
-        time.sleep(10)
+    try:
+        pages = scrapeCourses(courses, cache, lambda: makeDriver(DRIVER_PATH), baseUrl=args.base_url,
+                              nWorkers=args.workers, replay=args.replay, timeout=args.timeout,
+                              store=None if args.full else store)
+    except CacheMiss as miss:
+        parser.exit(1, 'No cached scrape of {}; run scrapeReviews.py without --replay first\n'.format(miss.args[0]))
+    if not args.replay:
+        print('{} expired cache objects removed'.format(cache.evict()), file=sys.stderr)
 
-        reviews = driver.find_elements_by_class_name('jss22')
+    # Append the reviews not stored yet; rows that do not parse go to quarantine.jsonl
+    with instrument.stage('store'):
+        for course in courses:
+            added, quarantined = store.add(course, pages[course])
+            print('{}: {} new reviews, {} quarantined'.format(course, added, quarantined))
 
-        for review in reviews:
-            textString = review.text.split('\n')
-            if len(textString) > 6:
-                reviewDict = dict(zip(['Class', 'DateTime', 'Review', 'Semester', 'Difficulty', 'Satisfaction', 'Workload'],
-                                      [textString[0], textString[1], textString[2], textString[3],
-                                       textString[4], textString[5], textString[len(textString)-1]]))
-                reviewList.append(reviewDict)
-            else:
-                reviewDict = dict(zip(['Class', 'DateTime', 'Review', 'Semester', 'Difficulty', 'Satisfaction', 'Workload'],
-                                      [textString[0], textString[1], textString[2], textString[3],
-                                       textString[4], 'None', textString[len(textString)-1]]))
-                reviewList.append(reviewDict)
+    # Index the review text of every stored course for reviewIndex.py queries
+    with instrument.stage('index'):
+        ReviewIndex.build(store.reviews()).save(args.index_dir or dataDir + '/reviewIndex')
 
-    reviewDF = pd.DataFrame(reviewList)
-    driver.quit()
\ No newline at end of file
+    reportPath = args.report or instrument.defaultReportPath(dataDir + '/reports', 'reviews')
+    recorder.writeReport(reportPath, profilePath=args.profile)
+    print('Timings written to {}'.format(reportPath), file=sys.stderr)
@@ -0,0 +1,203 @@
+# coding=utf8
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+
+MISSING = -1
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits):
+    """Total number of set bits in an array of unsigned integers."""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(_POPCOUNT8[np.ascontiguousarray(bits).view(np.uint8)].sum(dtype=np.int64))
+
+
+def _surveyFiles(path):
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.json')))
+    return [path]
+
+
+class SurveyMatrix:
+    """Survey responses as a respondent x question matrix of integer answer codes.
+
+    Each question has one label dictionary (labels[q][code] is the answer text) shared by
+    every export loaded into the matrix. Blank answers are stored as MISSING (-1).
+    """
+
+    def __init__(self, questionIds, texts, labels, codes):
+        self.questionIds = list(questionIds)
+        self.texts = list(texts)
+        self.labels = [np.asarray(l, dtype=object) for l in labels]
+        self.codes = codes
+        self.columns = {q: i for i, q in enumerate(self.questionIds)}
+
+    @property
+    def nRespondents(self):
+        return self.codes.shape[0]
+
+    def column(self, questionId):
+        return self.codes[:, self.columns[questionId]]
+
+    def labelsOf(self, questionId):
+        return self.labels[self.columns[questionId]]
+
+    def answers(self, questionId):
+        """Answer text per respondent, '' where missing."""
+        codes = self.column(questionId)
+        return np.append(self.labelsOf(questionId), '')[codes]
+
+    def marginals(self):
+        """Counts of every answer to every question, computed with a single bincount.
+
+        Returns (counts, blanks): {questionId: Series of counts indexed by label} and
+        {questionId: number of respondents who left the question blank}.
+        """
+        sizes = np.array([len(l) for l in self.labels], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        # Shift every question's codes into its own range and send blanks to a trailing bucket per question
+        flat = np.where(self.codes == MISSING, offsets[-1] + np.arange(len(sizes)), self.codes + offsets[:-1])
+        counts = np.bincount(flat.ravel(), minlength=offsets[-1] + len(sizes))
+        return ({q: pd.Series(counts[offsets[i]:offsets[i + 1]], index=self.labels[i])
+                 for i, q in enumerate(self.questionIds)},
+                {q: int(counts[offsets[-1] + i]) for i, q in enumerate(self.questionIds)})
+
+
+def _encode(answers, lookup, labels):
+    # Codes the distinct answers once and maps each respondent through the inverse index
+    unique, inverse = np.unique(np.asarray(answers, dtype=str), return_inverse=True)
+    mapped = np.empty(len(unique), dtype=np.int32)
+    for i, answer in enumerate(unique):
+        if answer == '':
+            mapped[i] = MISSING
+            continue
+        if answer not in lookup:
+            lookup[answer] = len(labels)
+            labels.append(answer)
+        mapped[i] = lookup[answer]
+    return mapped[inverse.ravel()]
+
+
+def loadSurvey(path):
+    """Load a surveyData.json export, or every *.json export in a directory, into a SurveyMatrix.
+
+    Questions are matched across exports by id; respondents of an export that lacks a
+    question get MISSING for it.
+    """
+    questionIds, texts, lookups, labels, blocks = [], [], {}, {}, []
+    for fileName in _surveyFiles(path):
+        with open(fileName, encoding='utf-8') as f:
+            surveyData = json.load(f)
+        nRespondents = max(len(q['answers']) for q in surveyData)
+        block = {}
+        for question in surveyData:
+            qid = question['id']
+            if qid not in lookups:
+                questionIds.append(qid)
+                texts.append(question['text'])
+                lookups[qid], labels[qid] = {}, []
+            block[qid] = _encode(question['answers'], lookups[qid], labels[qid])
+        blocks.append((nRespondents, block))
+
+    total = sum(n for n, _ in blocks)
+    nLabels = max([len(l) for l in labels.values()] + [1])
+    dtype = np.int8 if nLabels < 2**7 else np.int16 if nLabels < 2**15 else np.int32
+    codes = np.full((total, len(questionIds)), MISSING, dtype=dtype)
+    row = 0
+    for nRespondents, block in blocks:
+        for qid, column in block.items():
+            codes[row:row + len(column), questionIds.index(qid)] = column
+        row += nRespondents
+    return SurveyMatrix(questionIds, texts, [labels[q] for q in questionIds], codes)
+
+
+class MultiSelect:
+    """Answers to a "select all that apply" question encoded as one bitmask per respondent.
+
+    Bit j of masks[r] is set when respondent r chose options[j]. For queries the masks are also
+    sliced into one packed bitmap over respondents per option, so frequencies, co-occurrence
+    and cross-tabs are popcounts of ANDed bitmaps.
+    """
+
+    def __init__(self, options, masks, answered):
+        self.options = list(options)
+        self.masks = masks
+        self.answered = answered
+        self._slices = None
+
+    @classmethod
+    def fromSurvey(cls, survey, questionId, options=None, sep=';'):
+        labels = survey.labelsOf(questionId)
+        if options is None:
+            options = list(dict.fromkeys(o for label in labels for o in label.split(sep) if o != ''))
+        if len(options) > 64:
+            raise ValueError('at most 64 options can be encoded, got {}'.format(len(options)))
+        dtype = np.uint8 if len(options) <= 8 else np.uint16 if len(options) <= 16 \
+            else np.uint32 if len(options) <= 32 else np.uint64
+        bit = {o: 1 << j for j, o in enumerate(options)}
+
+        # Split each distinct answer once; the trailing 0 is the mask of a blank answer
+        labelMasks = np.zeros(len(labels) + 1, dtype=dtype)
+        for i, label in enumerate(labels):
+            for o in label.split(sep):
+                if o == '':
+                    continue
+                if o not in bit:
+                    raise ValueError('unknown option {!r} in question {}'.format(o, questionId))
+                labelMasks[i] |= bit[o]
+        codes = survey.column(questionId)
+        return cls(options, labelMasks[codes], codes != MISSING)
+
+    @property
+    def slices(self):
+        # One packed bitmap over respondents per option, shape (options, ceil(respondents / 8))
+        if self._slices is None:
+            self._slices = np.packbits(self.bits().T, axis=1)
+        return self._slices
+
+    def bits(self):
+        """Respondent x option matrix of 0/1."""
+        shifts = np.arange(len(self.options), dtype=self.masks.dtype)
+        return ((self.masks[:, None] >> shifts) & 1).astype(np.uint8)
+
+    def _where(self, rows):
+        return np.packbits(np.asarray(rows, dtype=bool))
+
+    def frequencies(self, rows=None):
+        """Respondents choosing each option, optionally only among rows (a boolean mask)."""
+        slices = self.slices if rows is None else self.slices & self._where(rows)
+        return pd.Series([popcount(s) for s in slices], index=self.options)
+
+    def cooccurrence(self, rows=None):
+        """Option x option counts of respondents who chose both."""
+        slices = self.slices if rows is None else self.slices & self._where(rows)
+        k = len(self.options)
+        counts = np.zeros((k, k), dtype=np.int64)
+        for i in range(k):
+            both = slices[i] & slices[i:]
+            if hasattr(np, 'bitwise_count'):
+                counts[i, i:] = np.bitwise_count(both).sum(axis=1, dtype=np.int64)
+            else:
+                counts[i, i:] = _POPCOUNT8[both].sum(axis=1, dtype=np.int64)
+        counts = np.triu(counts) + np.triu(counts, 1).T
+        return pd.DataFrame(counts, index=self.options, columns=self.options)
+
+    def selected(self, option):
+        """Boolean mask of respondents who chose option, for segmenting other queries."""
+        return (self.masks >> self.options.index(option)) & 1 == 1
+
+    def crosstab(self, survey, questionId, rows=None):
+        """Answer x option counts against a single-choice question, e.g. drop reasons by hours worked.
+
+        Respondents who left the single-choice question blank are not counted.
+        """
+        codes = survey.column(questionId)
+        labels = survey.labelsOf(questionId)
+        keep = np.ones(len(codes), dtype=bool) if rows is None else np.asarray(rows, dtype=bool)
+        table = [self.frequencies(keep & (codes == c)).to_numpy() for c in range(len(labels))]
+        return pd.DataFrame(table, index=labels, columns=self.options)
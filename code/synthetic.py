@@ -0,0 +1,68 @@
+# coding=utf8
+import json
+import numpy as np
+import pandas as pd
+
+SIZES = ['Very Large (>50 students)', 'Large (31-49 students)', 'Mid-Size (21-30 students)',
+         'Small (10-20 students)', 'Very Small (<10 students)']
+SIZE_WEIGHTS = [0.6, 0.12, 0.03, 0.07, 0.18]
+ONLINE_SECTIONS = ['O01', 'O03']
+CAMPUS_SECTIONS = ['A', 'Q', 'R', 'OAN', 'OCY', 'MSA', 'QSA']
+TERMS = ['{} {}'.format(season, year) for year in range(2005, 2025) for season in ('Spring', 'Summer', 'Fall')]
+
+
+def courseIds(nClasses, rng):
+    departments = rng.choice(['CS', 'CSE', 'ISYE'], size=nClasses, p=[0.8, 0.1, 0.1])
+    numbers = rng.choice(np.arange(6000, 8000), size=nClasses, replace=False)
+    return ['{} {}'.format(d, n) for d, n in zip(departments, numbers)]
+
+
+def courseCritiqueRows(nSections, seed=0, nClasses=None):
+    """Synthetic section rows with the columns and value ranges of data/CourseCritque.csv."""
+    rng = np.random.default_rng(seed)
+    nClasses = nClasses or int(np.clip(nSections // 25, 5, 1900))
+    classes = np.array(courseIds(nClasses, rng))
+    teachers = np.array(['Teacher {}'.format(i) for i in range(max(3, nClasses * 2))])
+
+    isOnline = rng.random(nSections) < 0.45
+    sections = np.where(isOnline, rng.choice(ONLINE_SECTIONS, size=nSections, p=[0.9, 0.1]),
+                        rng.choice(CAMPUS_SECTIONS, size=nSections))
+    # Online sections drop more often, as in the collected data
+    withdrawn = np.clip(rng.gamma(2.0, np.where(isOnline, 10.0, 6.0)), 0, 60)
+    grades = rng.dirichlet([8, 3, 1, 0.3, 0.3], size=nSections) * (100 - withdrawn)[:, None]
+    gpa = (grades * [4, 3, 2, 1, 0]).sum(axis=1) / np.maximum(grades.sum(axis=1), 1e-9)
+
+    frame = pd.DataFrame({
+        'Class': classes[rng.integers(0, nClasses, nSections)],
+        'Section': sections,
+        'Term': np.array(TERMS)[rng.integers(0, len(TERMS), nSections)],
+        'Size': np.array(SIZES)[rng.choice(len(SIZES), size=nSections, p=SIZE_WEIGHTS)],
+        'GPA': gpa.round(2),
+    })
+    for i, column in enumerate(['A%', 'B%', 'C%', 'D%', 'F%']):
+        frame[column] = grades[:, i].round(1)
+    frame['W%'] = withdrawn.round(1)
+    frame['Teacher'] = teachers[rng.integers(0, len(teachers), nSections)]
+    return frame
+
+
+def courseTableRows(classes, seed=0):
+    """Row texts shaped like the omscentral course table scrape for the given classes."""
+    rng = np.random.default_rng(seed)
+    return ['{} Course name\n{:.2f}\n{:.2f}\n{:.2f}'.format(c.replace(' ', '-'), rng.uniform(1, 5),
+                                                         rng.uniform(5, 25), rng.uniform(1, 5))
+            for c in classes]
+
+
+def surveyPayload(nRespondents, templatePath, seed=0):
+    """Survey export shaped like surveyData.json with nRespondents answers per question.
+
+    Every question keeps its id and text, and answers are drawn from that question's answers
+    in the template, so label sets and select-all combinations look like the real survey.
+    """
+    rng = np.random.default_rng(seed)
+    with open(templatePath, encoding='utf-8') as f:
+        template = json.load(f)
+    return [{'id': q['id'], 'text': q['text'],
+             'answers': list(np.array(q['answers'], dtype=object)[rng.integers(0, len(q['answers']), nRespondents)])}
+            for q in template]
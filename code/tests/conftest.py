@@ -0,0 +1,6 @@
+# coding=utf8
+import os
+import sys
+
+# The modules live side by side in code/ and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
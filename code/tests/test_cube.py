@@ -0,0 +1,47 @@
+# coding=utf8
+import pandas as pd
+from catalog import CourseCatalog
+from cube import DIMENSIONS, RetentionCube, accumulateCube
+from synthetic import courseCritiqueRows
+
+
+def buildCube(frame, path, catalog):
+    frame.to_csv(path, index=False)
+    return RetentionCube.fromAccumulator(accumulateCube(str(path)).toFrame(), catalog)
+
+
+def sortedCells(cube):
+    cells = cube.toFrame()
+    cells = cells.astype({key: str for key in DIMENSIONS if isinstance(cells[key].dtype, pd.CategoricalDtype)})
+    return cells.sort_values(DIMENSIONS).reset_index(drop=True)
+
+
+def test_update_matches_full_rebuild(tmp_path):
+    rows = courseCritiqueRows(3000, seed=2)
+    terms = sorted(rows['Term'].unique())
+    newTerms = rows['Term'].isin(terms[-5:])
+    catalog = CourseCatalog(sorted(rows['Class'].unique()))
+
+    full = buildCube(rows, tmp_path / 'full.csv', catalog)
+    cube = buildCube(rows[~newTerms], tmp_path / 'old.csv', catalog)
+    cube.update(buildCube(rows[newTerms], tmp_path / 'new.csv', catalog))
+    pd.testing.assert_frame_equal(sortedCells(cube), sortedCells(full), check_dtype=False)
+
+    # A term delivered again replaces its cells instead of being counted twice
+    cube.update(buildCube(rows[rows['Term'] == terms[0]], tmp_path / 'again.csv', catalog))
+    pd.testing.assert_frame_equal(sortedCells(cube), sortedCells(full), check_dtype=False)
+    assert cube.query(by=['Class']).equals(full.query(by=['Class']))
+
+
+def test_update_with_some_classes_keeps_the_others(tmp_path):
+    rows = courseCritiqueRows(3000, seed=3)
+    catalog = CourseCatalog(sorted(rows['Class'].unique()))
+    full = buildCube(rows, tmp_path / 'full.csv', catalog)
+    term = rows['Term'].value_counts().index[0]
+    oneClass = rows[(rows['Term'] == term) & (rows['Class'] == rows.loc[rows['Term'] == term, 'Class'].iloc[0])]
+
+    # An export collected for one course replaces that course's term and nothing else
+    full.update(buildCube(oneClass, tmp_path / 'one.csv', catalog))
+    before = buildCube(rows, tmp_path / 'again.csv', catalog)
+    pd.testing.assert_frame_equal(sortedCells(full), sortedCells(before), check_dtype=False)
+    assert full.query(by=['Class'], where={'Term': term})['Class'].nunique() == rows.loc[rows['Term'] == term, 'Class'].nunique()
@@ -0,0 +1,37 @@
+# coding=utf8
+from itertools import combinations
+import numpy as np
+import pytest
+from permutationTest import permutationTest
+
+
+def enumeratedPvalue(x, y, alternative):
+    # Share of all splits of the pooled values whose mean difference is at least as extreme
+    pooled = np.concatenate([x, y])
+    trueDiff = np.mean(x) - np.mean(y)
+    diffs = []
+    for split in combinations(range(len(pooled)), len(x)):
+        mask = np.zeros(len(pooled), dtype=bool)
+        mask[list(split)] = True
+        diffs.append(pooled[mask].mean() - pooled[~mask].mean())
+    diffs = np.array(diffs)
+    tol = 1e-12
+    if alternative == 'greater':
+        return np.mean(diffs >= trueDiff - tol)
+    if alternative == 'less':
+        return np.mean(diffs <= trueDiff + tol)
+    return np.mean(np.abs(diffs) >= abs(trueDiff) - tol)
+
+
+@pytest.mark.parametrize('alternative', ['two-sided', 'greater', 'less'])
+def test_exact_matches_enumeration(alternative):
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(0.3, 1, 6), rng.normal(0, 1, 7)
+    result = permutationTest(x, y, alternative=alternative, exact=True, chunkSize=100)
+    assert result.exact and result.nPerm == 1716
+    assert result.pvalue == pytest.approx(enumeratedPvalue(x, y, alternative))
+
+
+def test_exact_with_ties():
+    x, y = [1, 1, 2, 3], [1, 2, 2]
+    assert permutationTest(x, y, exact=True).pvalue == pytest.approx(enumeratedPvalue(x, y, 'two-sided'))
@@ -0,0 +1,46 @@
+# coding=utf8
+import numpy as np
+from reviewIndex import ReviewIndex, decodeVarint, encodeVarint, tokenize
+
+WORDS = ['the', 'ta', 'group', 'project', 'was', 'hard', 'time', 'great']
+QUERIES = ['ta', 'group project', 'the ta', 'project was hard', 'was the', 'time', 'missing', 'great great']
+
+
+def makeReviews(nReviews, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'Class': 'CS {}'.format(6000 + i % 3), 'DateTime': '2021-01-01', 'Semester': 'Fall 2020',
+             'Review': ' '.join(rng.choice(WORDS, size=rng.integers(0, 30))),
+             'Difficulty': '3', 'Satisfaction': '4', 'Workload': '10'} for i in range(nReviews)]
+
+
+def bruteForce(reviews, query):
+    # Phrase hits per review by sliding the query over each review's tokens
+    words = tokenize(query)
+    counts = {}
+    for doc, review in enumerate(reviews):
+        tokens = tokenize(review['Review'])
+        hits = sum(tokens[i:i + len(words)] == words for i in range(len(tokens) - len(words) + 1))
+        if hits:
+            counts[doc] = hits
+    return counts
+
+
+def test_varint_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 16383, 16384, 2**31, 2**40 + 5], dtype=np.int64)
+    assert np.array_equal(decodeVarint(encodeVarint(values)), values)
+
+
+def test_occurrences_match_brute_force(tmp_path):
+    reviews = makeReviews(200)
+    ReviewIndex.build(reviews).save(str(tmp_path))
+    for index in [ReviewIndex.build(reviews), ReviewIndex.load(str(tmp_path))]:
+        for query in QUERIES:
+            docs, hits = index.occurrences(query)
+            assert dict(zip(docs.tolist(), hits.tolist())) == bruteForce(reviews, query), query
+
+
+def test_phrases_do_not_span_reviews():
+    reviews = makeReviews(2)
+    reviews[0]['Review'], reviews[1]['Review'] = 'great group', 'project time'
+    docs, hits = ReviewIndex.build(reviews).occurrences('group project')
+    assert len(docs) == 0
@@ -0,0 +1,62 @@
+# coding=utf8
+import json
+import os
+import numpy as np
+import pytest
+from surveyStore import MultiSelect, loadSurvey
+
+SURVEY_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'surveyData.json')
+DROP_REASONS = '1626106015516'
+ENGAGEMENT = '1626105793308'
+WORKING = '1626104998715'
+PROGRAM = '1626105037244'
+
+
+@pytest.fixture(scope='module')
+def survey():
+    with open(SURVEY_PATH, encoding='utf-8') as f:
+        answers = {q['id']: q['answers'] for q in json.load(f)}
+    return loadSurvey(SURVEY_PATH), answers
+
+
+def chosen(answer):
+    return set(o for o in answer.split(';') if o)
+
+
+def test_frequencies_match_brute_force(survey):
+    matrix, answers = survey
+    reasons = MultiSelect.fromSurvey(matrix, DROP_REASONS)
+    online = np.array([a == 'Online' for a in answers[PROGRAM]])
+    for rows in [None, online]:
+        keep = np.ones(len(online), dtype=bool) if rows is None else rows
+        expected = [sum(o in chosen(a) for a, k in zip(answers[DROP_REASONS], keep) if k) for o in reasons.options]
+        assert reasons.frequencies(rows).tolist() == expected
+
+
+def test_cooccurrence_matches_brute_force(survey):
+    matrix, answers = survey
+    engagement = MultiSelect.fromSurvey(matrix, ENGAGEMENT)
+    table = engagement.cooccurrence()
+    for a in engagement.options:
+        for b in engagement.options:
+            assert table.loc[a, b] == sum(a in chosen(x) and b in chosen(x) for x in answers[ENGAGEMENT])
+
+
+@pytest.mark.parametrize('questionId', [WORKING, PROGRAM])
+def test_crosstab_matches_brute_force(survey, questionId):
+    matrix, answers = survey
+    reasons = MultiSelect.fromSurvey(matrix, DROP_REASONS)
+    table = reasons.crosstab(matrix, questionId)
+    for label in table.index:
+        for option in reasons.options:
+            assert table.loc[label, option] == sum(option in chosen(r) for r, q in
+                                                   zip(answers[DROP_REASONS], answers[questionId]) if q == label)
+    # Blank answers to the single-choice question are not counted
+    assert set(table.index) == set(answers[questionId]) - {''}
+
+
+def test_selected_segments_respondents(survey):
+    matrix, answers = survey
+    reasons = MultiSelect.fromSurvey(matrix, DROP_REASONS)
+    mask = reasons.selected('Did not have enough time')
+    assert mask.tolist() == ['Did not have enough time' in chosen(a) for a in answers[DROP_REASONS]]